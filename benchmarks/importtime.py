@@ -0,0 +1,91 @@
+"""Import time budget for trackr, measured with `python -X importtime`.
+
+    python -m benchmarks.importtime [-r RUNS] [--budget MS]
+
+Each target is imported in a fresh interpreter `RUNS` times and the fastest
+cumulative import time is compared against the budget. Independently of the
+timings, importing a target must not pull in the dependencies that are only
+needed later (YAML parsing, asyncio, pickled modules, HTTP). Exits with status
+1 when a check fails.
+
+The eager import check also runs in the test suite (`tests/test_importtime.py`),
+the timings depend on the machine and are only checked here.
+"""
+
+import argparse, re, subprocess, sys
+
+
+TARGETS = ["trackr", "trackr.core.module", "trackr.cli.main"]
+
+# imported on first use only, see the lazy imports in trackr.core
+LAZY_MODULES = ["yaml", "asyncio", "pickle", "requests", "urllib3", "concurrent.futures", "hashlib"]
+
+DEFAULT_BUDGET_MS = 100.0
+
+IMPORTTIME_LINE = re.compile(r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|\s*(.+)$")
+
+
+def import_times(target: str) -> dict[str, float]:
+    """Cumulative import time in milliseconds of every module imported by `target`,
+    in a fresh interpreter."""
+
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, check=True,
+    )
+
+    return {
+        match.group(3).strip(): int(match.group(2)) / 1000
+        for match in map(IMPORTTIME_LINE.match, process.stderr.splitlines())
+        if match
+    }
+
+
+def import_time(target: str) -> float:
+    """Cumulative import time of `target` in milliseconds."""
+
+    if (elapsed := import_times(target).get(target, None)) is None:
+        raise RuntimeError(f"no import time reported for {target}")
+
+    return elapsed
+
+
+def eager_modules(target: str) -> list[str]:
+    """Lazy modules that are imported anyway by importing `target`."""
+
+    loaded = import_times(target)
+
+    return [module for module in LAZY_MODULES if module in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-r", "--runs", type=int, default=5, help="number of runs, the fastest one is reported")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS, help="import time budget per target in ms")
+    args = parser.parse_args()
+
+    failures = []
+
+    print(f"{'target':<24} {'import ms':>10} {'budget ms':>10}  eager imports")
+
+    for target in TARGETS:
+        elapsed = min(import_time(target) for _ in range(args.runs))
+        eager = eager_modules(target)
+
+        print(f"{target:<24} {elapsed:>10.1f} {args.budget:>10.1f}  {', '.join(eager) or '-'}")
+
+        if elapsed > args.budget:
+            failures.append(f"{target} imports in {elapsed:.1f}ms, over the {args.budget:.1f}ms budget")
+
+        if eager:
+            failures.append(f"{target} eagerly imports {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Result mapping throughput: the generated `ResultMapper` against the per-item
+constructor dispatch it replaced.
+
+    python -m benchmarks.mapper [-n ITEMS] [-r REPEAT]
+"""
+
+import argparse, logging, time
+
+from trackr.core.constructors import Constructor
+from trackr.core.context import SearchContext
+from trackr.core.module import SearchModule
+from trackr.core.utility import get_by_dot_path
+
+
+def legacy_map_results(module: SearchModule, context: SearchContext, items: list[dict]) -> list[dict]:
+    mapping = module.result_mapping["mapping"]
+    variable_name = module.result_mapping.get("variable_name", "item")
+
+    results = []
+
+    for item in items:
+        result = {}
+
+        for key, value in mapping.items():
+            if isinstance(value, Constructor):
+                result[key] = value(context, **{variable_name: item})
+            else:
+                result[key] = get_by_dot_path(item, value)
+
+        results.append(result)
+
+    return results
+
+
+def atb_items(count: int) -> list[dict]:
+    return [
+        {"name": f"Молоко {i}", "picture": f"https://example.com/{i}.png", "price": 30 + i % 50, "url": f"/product/{i}"}
+        for i in range(count)
+    ]
+
+
+def metro_items(count: int, location: str) -> list[dict]:
+    return [
+        {
+            "description": f"Молоко {i}",
+            "imageUrl": f"https://example.com/{i}.png",
+            "bundleId": {"articleNumber": f"BTY-X{i}", "variantNumber": "0001", "bundleNumber": "0021"},
+            "stores": {location: {"sellingPriceInfo": {"finalPrice": 30.5 + i % 50}}},
+        }
+        for i in range(count)
+    ]
+
+
+def measure(func, repeat: int) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--items", type=int, default=10000, help="number of result items")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="number of runs, the best one is reported")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    cases = [
+        ("atb", 827, atb_items(args.items)),
+        ("metro", "00013", metro_items(args.items, "00013")),
+    ]
+
+    print(f"{'module':<8} {'legacy items/s':>16} {'mapper items/s':>16} {'speedup':>8}")
+
+    for module_id, location, items in cases:
+        module = SearchModule.from_yaml(f"modules/{module_id}.yaml")
+        context = SearchContext(module, "молоко", location)
+
+        assert legacy_map_results(module, context, items) == module.result_mapper(context, items)
+
+        legacy = measure(lambda: legacy_map_results(module, context, items), args.repeat)
+        mapper = measure(lambda: module.result_mapper(context, items), args.repeat)
+
+        print(f"{module_id:<8} {len(items) / legacy:>16,.0f} {len(items) / mapper:>16,.0f} {legacy / mapper:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
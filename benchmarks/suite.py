@@ -0,0 +1,215 @@
+"""Offline benchmark suite for the bundled modules. Upstream responses are
+replayed from `benchmarks/fixtures`, so only trackr's own overhead is measured.
+
+    python -m benchmarks.suite [-m MODULE ...] [-n SEARCHES] [-r REPEAT]
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --baseline baseline.json [--threshold 0.25]
+    python -m benchmarks.suite --record
+
+`--baseline` compares the run against saved results and exits with status 1
+when a metric regressed by more than the threshold. `--record` runs one live
+search per module and overwrites its fixture.
+"""
+
+import argparse, json, logging, statistics, sys, tempfile, time, tracemalloc
+from pathlib import Path
+
+from trackr import MODULE_FILE_EXTENSION
+from trackr.cli.compiler import compile_module
+from trackr.core.context import SearchContext
+from trackr.core.module import SearchModule
+from trackr.core.transport import RecordingTransport, StaticTransport
+
+
+MODULES_DIRECTORY = Path("modules")
+FIXTURES_DIRECTORY = Path(__file__).parent / "fixtures"
+
+# locations used by the searches of each module, they must be present in the fixtures
+LOCATIONS = {
+    "atb": [827, 842, 996],
+    "metro": ["00013", "00032", "00011"],
+}
+
+# metric name -> True when higher is better
+METRICS = {
+    "yaml_load_ms": False,
+    "compile_ms": False,
+    "ysm_load_ms": False,
+    "search_p50_ms": False,
+    "search_p90_ms": False,
+    "search_p99_ms": False,
+    "mapping_items_per_s": True,
+    "peak_memory_kib": False,
+}
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def run_searches(module: SearchModule, module_id: str, searches: int) -> list[float]:
+    locations = LOCATIONS[module_id]
+    latencies = []
+
+    for index in range(searches):
+        # every query is unique, so a configured response cache never hits
+        start = time.perf_counter()
+        results = module.search(f"молоко {index}", locations[index % len(locations)])
+        latencies.append(time.perf_counter() - start)
+
+        if not results:
+            raise RuntimeError(f"no results from fixture: {module_id}")
+
+    return latencies
+
+
+def mapping_throughput(module: SearchModule, module_id: str, repeat: int) -> float:
+    context = SearchContext(module, "молоко", LOCATIONS[module_id][0])
+    module._execute_actions(context)
+
+    mapper = module.result_mapper
+    items = list(mapper.attribute_path.get(context.attributes))
+    rounds = max(1, 20000 // max(1, len(items)))
+
+    elapsed = best_of(lambda: [mapper(context, items) for _ in range(rounds)], repeat)
+
+    return len(items) * rounds / elapsed
+
+
+def benchmark_module(module_id: str, searches: int, repeat: int) -> dict:
+    yaml_path = MODULES_DIRECTORY / f"{module_id}.yaml"
+    transport = StaticTransport.from_recording(FIXTURES_DIRECTORY / f"{module_id}.json")
+
+    with tempfile.TemporaryDirectory() as directory:
+        ysm_path = str(Path(directory) / f"{module_id}.yaml{MODULE_FILE_EXTENSION}")
+
+        yaml_load = best_of(lambda: SearchModule.from_yaml(str(yaml_path)), repeat)
+        compile_time = best_of(lambda: compile_module(str(yaml_path), ysm_path, force=True), repeat)
+        ysm_load = best_of(lambda: SearchModule.from_compiled(ysm_path), repeat)
+
+        module = SearchModule.from_compiled(ysm_path)
+        module._trackr_section.pop("rate_limit", None)  # fixtures are replayed, pacing would only add sleeps
+        module.transport = transport
+
+        run_searches(module, module_id, min(searches, 10))  # warm up lazily prepared state
+        latencies = run_searches(module, module_id, searches)
+        throughput = mapping_throughput(module, module_id, repeat)
+
+        # tracing slows everything down, so memory is measured in a separate pass
+        tracemalloc.start()
+
+        try:
+            module = SearchModule.from_compiled(ysm_path)
+            module._trackr_section.pop("rate_limit", None)
+            module.transport = transport
+            run_searches(module, module_id, min(searches, 50))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "yaml_load_ms": yaml_load * 1000,
+        "compile_ms": compile_time * 1000,
+        "ysm_load_ms": ysm_load * 1000,
+        "search_p50_ms": percentile(latencies, 0.50) * 1000,
+        "search_p90_ms": percentile(latencies, 0.90) * 1000,
+        "search_p99_ms": percentile(latencies, 0.99) * 1000,
+        "search_mean_ms": statistics.fmean(latencies) * 1000,
+        "mapping_items_per_s": throughput,
+        "peak_memory_kib": peak / 1024,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """List the metrics that are more than `threshold` worse than the baseline."""
+
+    regressions = []
+
+    for module_id, metrics in results.items():
+        for name, higher_is_better in METRICS.items():
+            base = baseline.get(module_id, {}).get(name, None)
+
+            if not base or name not in metrics:
+                continue
+
+            change = (metrics[name] - base) / base
+
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(f"{module_id}.{name}: {base:,.3f} -> {metrics[name]:,.3f} ({change:+.0%})")
+
+    return regressions
+
+
+def record(module_ids: list[str]) -> None:
+    for module_id in module_ids:
+        module = SearchModule.from_yaml(str(MODULES_DIRECTORY / f"{module_id}.yaml"))
+        transport = RecordingTransport(module._base_transport())
+        module.transport = transport
+
+        module.search("молоко", LOCATIONS[module_id][0])
+        transport.save(FIXTURES_DIRECTORY / f"{module_id}.json")
+
+        print(f"{module_id}: recorded {len(transport.exchanges)} exchanges")
+
+
+def print_results(results: dict) -> None:
+    names = list(next(iter(results.values())).keys())
+
+    print(f"{'metric':<22}" + "".join(f"{module_id:>16}" for module_id in results))
+
+    for name in names:
+        print(f"{name:<22}" + "".join(f"{metrics[name]:>16,.3f}" for metrics in results.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-m", "--modules", nargs="+", default=list(LOCATIONS), help="modules to benchmark")
+    parser.add_argument("-n", "--searches", type=int, default=200, help="number of searches per module")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="number of runs, the best one is reported")
+    parser.add_argument("--save", help="write the results to a JSON file")
+    parser.add_argument("--baseline", help="compare the results against a saved JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--record", action="store_true", help="record fixtures from the live upstreams")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    if args.record:
+        record(args.modules)
+        return
+
+    results = {module_id: benchmark_module(module_id, args.searches, args.repeat) for module_id in args.modules}
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.threshold)
+
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+
+        if regressions:
+            sys.exit(1)
+
+        print(f"no regressions above {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
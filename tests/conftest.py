@@ -0,0 +1,42 @@
+import textwrap
+from pathlib import Path
+
+import pytest
+
+
+ROOT_DIRECTORY = Path(__file__).parent.parent
+MODULES_DIRECTORY = ROOT_DIRECTORY / "modules"
+FIXTURES_DIRECTORY = ROOT_DIRECTORY / "benchmarks" / "fixtures"
+
+MODULE_TEMPLATE = """\
+trackr:
+  minversion: 1.0.0
+{trackr}
+meta:
+  enabled: true
+  id: {id}
+  version: 1.0.0
+main:
+{main}
+"""
+
+
+@pytest.fixture
+def make_module(tmp_path):
+    """Write a module YAML to a temporary directory, returns its path.
+
+    `main` and `trackr` are the bodies of their sections, they are dedented
+    and indented below the section key.
+    """
+
+    def make_module(main: str, id: str = "test", trackr: str = "", name: str = None) -> Path:
+        path = tmp_path / f"{name or id}.yaml"
+        path.write_text(MODULE_TEMPLATE.format(
+            id=id,
+            trackr=textwrap.indent(textwrap.dedent(trackr).strip("\n"), "  "),
+            main=textwrap.indent(textwrap.dedent(main).strip("\n"), "  "),
+        ), encoding="utf-8")
+
+        return path
+
+    return make_module
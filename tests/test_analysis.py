@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from trackr.core.analysis import analyze_expression
+from trackr.core.module import SearchModule
+from trackr.core.transport import StaticTransport
+
+
+FIRST_URL = "https://example.com/first"
+SECOND_URL = "https://example.com/second"
+
+# `second` reads `first` without declaring the dependency
+MAIN = f"""
+actions:
+  - action: request
+    args:
+      save_to: first
+      url: {FIRST_URL}
+  - action: request
+    args:
+      save_to: second
+      url: {SECOND_URL}
+      params:
+        ids: !dynamic type="computed" value="[i['id'] for i in first]"
+result_mapping:
+  attribute: second
+  mapping:
+    id: !dynamic type="computed" value="item"
+"""
+
+
+@pytest.fixture
+def module(make_module) -> SearchModule:
+    module = SearchModule.from_yaml(str(make_module(MAIN)))
+    module.transport = StaticTransport({
+        FIRST_URL: [{"id": 1}, {"id": 2}],
+        SECOND_URL: lambda params, **_: params["ids"],
+    })
+
+    return module
+
+
+def test_inferred_dependencies_order_actions(module):
+    assert module.actions[1].inputs == {"first"}
+    assert module.action_graph.dependencies == [set(), {0}]
+    assert module.action_graph.levels() == [[0], [1]]
+
+
+def test_async_matches_sync(module):
+    assert asyncio.run(module.search_async("milk", None)) == module.search("milk", None) == [{"id": 1}, {"id": 2}]
+
+
+def test_undefined_name(make_module):
+    path = make_module(MAIN.replace("for i in first", "for i in missing"))
+
+    with pytest.raises(ValueError, match="missing"):
+        SearchModule.from_yaml(str(path))
+
+
+def test_imports():
+    assert analyze_expression("datetime.date.today()", []).imports == ["datetime"]
+    assert analyze_expression("calendar.isleap(2024)", [], imports=["calendar"]).imports == ["calendar"]
+
+    # only allowed modules are imported without being declared
+    for expression in ["this", "antigravity", "calendar.isleap(2024)"]:
+        with pytest.raises(ValueError, match="undefined name"):
+            analyze_expression(expression, [])
@@ -0,0 +1,60 @@
+import json
+
+from trackr.core.batch import BatchJob, BatchRunner, expand_jobs
+from trackr.core.module import SearchModule
+
+
+MAIN = """
+initialize:
+  attributes:
+    items: [1, 2]
+actions: []
+result_mapping:
+  attribute: items
+  mapping:
+    value: !dynamic type="computed" value="item"
+    location: !dynamic type="attribute" value="$location"
+"""
+
+LOCATIONS = """
+location_data:
+  Київ:
+    Хрещатик, 1: 10
+    Хрещатик, 2: 11
+  Львів:
+    Городоцька, 3: 10
+"""
+
+
+def test_expand_jobs(make_module):
+    module = SearchModule.from_yaml(str(make_module(MAIN + LOCATIONS)))
+    jobs = list(expand_jobs(module, ["milk", "bread"]))
+
+    # stores shared by several addresses are searched once
+    assert [(job.query, job.location) for job in jobs] == [("milk", 10), ("milk", 11), ("bread", 10), ("bread", 11)]
+
+
+def test_expand_jobs_without_location_data(make_module):
+    module = SearchModule.from_yaml(str(make_module(MAIN)))
+
+    assert list(expand_jobs(module, ["milk"])) == []
+
+
+def test_run_resumes(make_module, tmp_path):
+    module = SearchModule.from_yaml(str(make_module(MAIN)))
+    output = tmp_path / "output.jsonl"
+    jobs = [BatchJob("test", "milk", location) for location in range(5)]
+
+    runner = BatchRunner(lambda module_id: module, concurrency=2)
+    runner.run(jobs[:3], str(output))
+
+    # a record cut off by an interruption runs again
+    output.write_text(output.read_text(encoding="utf-8")[:-10], encoding="utf-8")
+
+    stats = runner.run(jobs, str(output))
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+
+    assert (stats.total, stats.skipped, stats.succeeded) == (5, 2, 3)
+    assert sorted(record["location"] for record in records) == list(range(5))
+    assert all(record["results"] == [{"value": 1, "location": record["location"]}, {"value": 2, "location": record["location"]}]
+               for record in records)
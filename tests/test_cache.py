@@ -0,0 +1,28 @@
+import threading
+
+from trackr.core.cache import ResponseCache
+from trackr.core.transport import TransportResponse
+
+
+def test_disk_cache_is_shared(tmp_path):
+    writers = [ResponseCache(path=str(tmp_path)) for _ in range(4)]
+
+    # several caches sharing the directory write the same key at once
+    threads = [
+        threading.Thread(target=cache.set, args=("key", TransportResponse(200, f"{index}".encode())))
+        for index, cache in enumerate(writers)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert [path.name for path in tmp_path.iterdir()] == ["key.cache"]
+
+    reader = ResponseCache(path=str(tmp_path))
+
+    assert reader.get("key").content in {b"0", b"1", b"2", b"3"}
+    assert reader.get("missing") is None
+    assert (reader.stats.hits, reader.stats.misses) == (1, 1)
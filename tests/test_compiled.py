@@ -0,0 +1,127 @@
+import builtins, json, pickle
+
+import pytest
+
+from trackr import MODULE_FILE_EXTENSION
+from trackr.cli.compiler import compile_module
+from trackr.core.compiled import ModuleFile, SECTION_LOCATIONS, SECTION_LOCATION_INDEX
+from trackr.core.location import CompactLocationData
+from trackr.core.module import SearchModule
+
+
+MAIN = """
+location_data: locations.json
+initialize:
+  attributes:
+    items: [1, 2]
+actions: []
+result_mapping:
+  attribute: items
+  mapping:
+    value: !dynamic type="computed" value="item * 2"
+    location: !dynamic type="attribute" value="$location"
+"""
+
+LOCATIONS = {"Київ": {"вул. Хрещатик, 1": 10, "вул. Хрещатик, 2": "11a"}}
+
+
+@pytest.fixture
+def compiled(make_module):
+    path = make_module(MAIN)
+    (path.parent / "locations.json").write_text(json.dumps(LOCATIONS, ensure_ascii=False), encoding="utf-8")
+
+    assert compile_module(str(path))
+
+    return path, f"{path}{MODULE_FILE_EXTENSION}"
+
+
+def test_round_trip(compiled):
+    source, output = compiled
+    module_file = ModuleFile(output)
+
+    assert module_file.meta["meta"]["id"] == "test"
+    assert module_file.source_paths == [str(source), str(source.parent / "locations.json")]
+    assert {SECTION_LOCATIONS, SECTION_LOCATION_INDEX} <= set(module_file.sections)
+    assert module_file.is_up_to_date()
+
+    module = SearchModule.from_compiled(output)
+    expected = SearchModule.from_yaml(str(source)).search("milk", 10)
+
+    assert module.search("milk", 10) == expected == [{"value": 2, "location": 10}, {"value": 4, "location": 10}]
+
+    assert isinstance(module.location_data, CompactLocationData)
+    assert module.location_data["Київ", "вул. Хрещатик, 2"] == "11a"
+    assert module.location_data.find("київ", "хрещатик 1")[0].value == 10
+    assert module.location_data.address("11a") == ("Київ", "вул. Хрещатик, 2")
+
+
+def test_mapping_is_not_compiled_again(compiled, monkeypatch):
+    _, output = compiled
+    module = SearchModule.from_compiled(output)
+
+    compile, sources = builtins.compile, []
+
+    def record(source, filename, *args, **kwargs):
+        if str(filename).startswith(("<dynamic", "<mapping")):
+            sources.append(source)
+
+        return compile(source, filename, *args, **kwargs)
+
+    # the expressions and per-item functions of the mapping are stored in the module file
+    monkeypatch.setattr(builtins, "compile", record)
+    results = module.search("milk", 10)
+    monkeypatch.undo()
+
+    assert sources == []
+    assert results == [{"value": 2, "location": 10}, {"value": 4, "location": 10}]
+
+
+def test_pickle_in_another_directory(compiled, monkeypatch, tmp_path_factory):
+    source, output = compiled
+
+    monkeypatch.chdir(source.parent)
+    data = pickle.dumps(SearchModule.from_compiled(f"{source.name}{MODULE_FILE_EXTENSION}"))
+
+    # a worker process may run with another working directory
+    monkeypatch.chdir(tmp_path_factory.mktemp("worker"))
+    module = pickle.loads(data)
+
+    assert module.location_data["Київ", "вул. Хрещатик, 2"] == "11a"
+    assert module.location_data.find("київ", "хрещатик 1")[0].value == 10
+
+
+def test_up_to_date_modules_are_skipped(compiled):
+    source, _ = compiled
+
+    assert not compile_module(str(source))
+
+
+@pytest.mark.parametrize("changed", ["test.yaml", "locations.json"])
+def test_stale_sources(compiled, changed):
+    source, output = compiled
+    path = source.parent / changed
+
+    # a changed mtime alone doesn't make a module stale, only changed content
+    path.write_bytes(path.read_bytes())
+    assert ModuleFile(output).is_up_to_date()
+
+    path.write_bytes(path.read_bytes() + b"\n")
+    assert not ModuleFile(output).is_up_to_date()
+
+    assert compile_module(str(source))
+    assert ModuleFile(output).is_up_to_date()
+
+
+def test_missing_source(compiled):
+    source, output = compiled
+    source.unlink()
+
+    assert not ModuleFile(output).is_up_to_date()
+
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / f"test.yaml{MODULE_FILE_EXTENSION}"
+    path.write_bytes(b"TRKX" + bytes(64))
+
+    with pytest.raises(ValueError):
+        ModuleFile(str(path))
@@ -0,0 +1,55 @@
+import threading, time
+
+import pytest
+
+from trackr.core.engine import SearchEngine
+from trackr.core.registry import ModuleRegistry
+from trackr.core.transport import StaticTransport
+
+
+URL = "https://example.com/search"
+
+MAIN = f"""
+actions:
+  - action: request
+    args:
+      save_to: response
+      url: {URL}
+result_mapping:
+  attribute: response
+  mapping:
+    value: !dynamic type="computed" value="item"
+"""
+
+
+@pytest.fixture
+def slow_engine(make_module):
+    # the file name differs from the meta id, the registry keys modules by file name
+    path = make_module(MAIN, id="store", name="slow")
+    release = threading.Event()
+
+    registry = ModuleRegistry(str(path.parent), check_interval=60)
+    registry.get("slow").transport = StaticTransport({URL: lambda **_: [1] if release.wait(5) else []})
+
+    with SearchEngine.from_registry(registry) as engine:
+        yield engine
+
+    release.set()
+
+
+def test_registry_module_times_out(slow_engine):
+    start = time.monotonic()
+    (result,) = slow_engine.search_all("milk", None, timeout=0.2)
+
+    assert time.monotonic() - start < 2
+    assert result.module_id == "slow"
+    assert isinstance(result.error, TimeoutError)
+
+
+def test_registry_module_times_out_iter(slow_engine):
+    start = time.monotonic()
+    errors = []
+
+    assert list(slow_engine.search_iter("milk", None, timeout=0.2, errors=errors)) == []
+    assert time.monotonic() - start < 2
+    assert [(error.module_id, type(error.error)) for error in errors] == [("slow", TimeoutError)]
@@ -0,0 +1,95 @@
+import pytest
+
+from trackr.core.actions import ChainUpdateAction
+from trackr.core.analysis import fuse_expressions
+from trackr.core.module import SearchModule
+from trackr.core.transport import StaticTransport
+
+from .conftest import FIXTURES_DIRECTORY, MODULES_DIRECTORY
+
+
+LOCATIONS = {"atb": 827, "metro": "00013"}
+
+
+def load(module_id: str) -> SearchModule:
+    module = SearchModule.from_yaml(str(MODULES_DIRECTORY / f"{module_id}.yaml"))
+    module._trackr_section.pop("rate_limit", None)  # fixtures are replayed, pacing would only add sleeps
+    module.transport = StaticTransport.from_recording(str(FIXTURES_DIRECTORY / f"{module_id}.json"))
+
+    return module
+
+
+def chain_updates(module: SearchModule) -> list[ChainUpdateAction]:
+    return [action for action in module.actions if isinstance(action, ChainUpdateAction)]
+
+
+@pytest.mark.parametrize("module_id", ["atb", "metro"])
+@pytest.mark.parametrize("lazy", [True, False])
+def test_fused_matches_unfused(module_id, lazy):
+    module = load(module_id)
+    actions = chain_updates(module)
+
+    for action in actions:
+        action.pipeline = None
+        assert action.fuse(lazy)
+
+    fused = module.search("молоко", LOCATIONS[module_id])
+
+    for action in actions:
+        action.pipeline = None
+
+    unfused = module.search("молоко", LOCATIONS[module_id])
+
+    assert fused and fused == unfused
+
+
+def test_metro_is_fused():
+    (action,) = chain_updates(load("metro"))
+
+    # the result mapping only iterates the response, so the pipeline stays lazy
+    assert action.pipeline is not None
+    assert action.pipeline.value.startswith("__.flatten(")
+    assert "[" not in action.pipeline.value
+
+
+def test_fuse_expressions():
+    expressions = ["response.values()", "[v['items'] for v in response]", "__.array_flatten(response)"]
+
+    assert fuse_expressions(expressions, "response") == "__.array_flatten((v['items'] for v in response.values()))"
+    assert fuse_expressions(expressions, "response", lazy=True) == "__.flatten((v['items'] for v in response.values()))"
+
+    # a variable read per item or more than once is not substituted
+    assert fuse_expressions(["response", "[response for v in x]"], "response") is None
+    assert fuse_expressions(["response", "response + response"], "response") is None
+
+
+@pytest.mark.parametrize("field", ["len(response)", "response[0]['id']"])
+def test_stays_eager_when_mapping_reads_attribute(make_module, field):
+    url = "https://example.com/search"
+    path = make_module(f"""
+        actions:
+          - action: request
+            args:
+              save_to: response
+              url: {url}
+          - action: chain_update
+            args:
+              attribute: response
+              updates:
+                - !dynamic type="computed" value="[group['items'] for group in response]"
+                - !dynamic type="computed" value="__.array_flatten(response)"
+        result_mapping:
+          attribute: response
+          mapping:
+            id: !dynamic type="computed" value="item['id']"
+            field: !dynamic type="computed" value="{field}"
+    """)
+
+    module = SearchModule.from_yaml(str(path))
+    module.transport = StaticTransport({url: [{"items": [{"id": 1}, {"id": 2}]}, {"items": [{"id": 3}]}]})
+
+    (action,) = chain_updates(module)
+    assert action.pipeline is not None and not action.pipeline.value.startswith("__.flatten(")
+
+    expected = 3 if field.startswith("len") else 1
+    assert module.search("milk", None) == [{"id": id, "field": expected} for id in [1, 2, 3]]
@@ -0,0 +1,14 @@
+import pytest
+
+from benchmarks.importtime import LAZY_MODULES, TARGETS, eager_modules, import_times
+
+
+@pytest.mark.parametrize("target", TARGETS)
+def test_lazy_modules_are_not_imported(target):
+    assert eager_modules(target) == []
+
+
+def test_lazy_modules_are_detected():
+    # importing any lazy module directly has to be reported, or the check above could never fail
+    for module in LAZY_MODULES:
+        assert module in import_times(module)
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from trackr.core.actions import merge_location_responses
+from trackr.core.context import SearchContext
+from trackr.core.module import SearchModule
+from trackr.core.transport import StaticTransport
+
+
+SEARCH_URL = "https://example.com/search"
+PRICES_URL = "https://example.com/prices"
+
+# the articles of every store
+STORES = {1: ["milk", "bread"], 2: ["bread", "cheese"], 3: ["kefir"]}
+
+TRACKR = """
+    multi_location:
+      max_locations: 10
+"""
+
+MAIN = f"""
+actions:
+  - action: {{action}}
+    args:
+      save_to: ids
+      url: {SEARCH_URL}
+      per_location: {{per_location}}
+      items: ids
+      params:
+        store: !dynamic type="attribute" value="$location"
+  - action: request
+    args:
+      save_to: prices
+      url: {PRICES_URL}
+      params:
+        stores: !dynamic type="attribute" value="$locations"
+        ids: !dynamic type="attribute" value="ids"
+result_mapping:
+  attribute: prices
+  variable_name: price
+  where: !dynamic type="computed" dependencies="$location" value="price['store'] == location"
+  mapping:
+    name: !dynamic type="computed" value="price['id']"
+"""
+
+
+def serve(module: SearchModule, paginated: bool) -> StaticTransport:
+    def search(params: dict, **_) -> list | dict:
+        ids = STORES[params["store"]]
+
+        if paginated:
+            return {"ids": ids if params["page"] == 1 else []}
+
+        return ids
+
+    def prices(params: dict, **_) -> list:
+        return [{"store": store, "id": id} for store in params["stores"] for id in params["ids"] if id in STORES[store]]
+
+    transport = StaticTransport({SEARCH_URL: search, PRICES_URL: prices})
+    module.transport = transport
+
+    return transport
+
+
+@pytest.fixture(params=["request", "paginate"])
+def make_searcher(make_module, request):
+    def make(per_location: bool = True) -> tuple[SearchModule, StaticTransport]:
+        main = MAIN.format(action=request.param, per_location=str(per_location).lower())
+
+        if request.param == "request":
+            main = main.replace("      items: ids\n", "")
+
+        module = SearchModule.from_yaml(str(make_module(main, trackr=TRACKR)))
+
+        return module, serve(module, request.param == "paginate")
+
+    return make
+
+
+def names(results: list[dict]) -> list:
+    return [result["name"] for result in results]
+
+
+def test_every_location_is_looked_up(make_searcher):
+    module, transport = make_searcher()
+    results = module.search_many("milk", [1, 2, 3])
+
+    assert {location: names(items) for location, items in results.items()} == {
+        1: ["milk", "bread"],
+        2: ["bread", "cheese"],
+        3: ["kefir"],
+    }
+
+    # the ids of all stores are priced in a single request
+    searches = [call for call in transport.calls if call["url"] == SEARCH_URL]
+    assert sorted({call["params"]["store"] for call in searches}) == [1, 2, 3]
+    assert [call["params"]["ids"] for call in transport.calls if call["url"] == PRICES_URL] == [
+        ["milk", "bread", "cheese", "kefir"]
+    ]
+
+    for location in [1, 2, 3]:
+        assert names(module.search("milk", location)) == names(results[location])
+
+
+def test_async_matches_sync(make_searcher):
+    module, _ = make_searcher()
+    contexts = [SearchContext(module, "milk", 1, [1, 2, 3]) for _ in range(2)]
+
+    module._execute_actions(contexts[0])
+    asyncio.run(module._execute_actions_async(contexts[1]))
+
+    assert contexts[0].attributes["ids"] == contexts[1].attributes["ids"] == ["milk", "bread", "cheese", "kefir"]
+    assert contexts[0].attributes["prices"] == contexts[1].attributes["prices"]
+
+
+def test_first_location_only_without_per_location(make_searcher):
+    module, _ = make_searcher(per_location=False)
+    results = module.search_many("milk", [1, 2, 3])
+
+    assert {location: names(items) for location, items in results.items()} == {1: ["milk", "bread"], 2: ["bread"], 3: []}
+
+
+def test_merge_location_responses():
+    assert merge_location_responses([[1, 2], [2, 3], [{"a": 1}], [{"a": 1}]]) == [1, 2, 3, {"a": 1}, {"a": 1}]
+    assert merge_location_responses([{"a": 1}, [2]]) == [{"a": 1}, [2]]
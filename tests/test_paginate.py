@@ -0,0 +1,117 @@
+import asyncio, json
+
+import pytest
+
+from trackr.core.module import SearchModule
+from trackr.core.transport import StaticTransport
+
+
+URL = "https://example.com/search"
+
+
+def make_paginated(make_module, **args) -> SearchModule:
+    # JSON is a valid YAML flow mapping
+    args = json.dumps({"save_to": "response", "url": URL, "concurrency": 1, **args})
+
+    path = make_module(f"""
+        actions:
+          - action: paginate
+            args: {args}
+        result_mapping:
+          attribute: response
+          mapping:
+            value: !dynamic type="computed" value="item"
+    """)
+
+    return SearchModule.from_yaml(str(path))
+
+
+def serve(module: SearchModule, count: int, total: bool = False, wrap: bool = True) -> StaticTransport:
+    """Serve `count` items, pages hold `rows` items (2 by default)."""
+
+    def page(params: dict, **_) -> dict | list:
+        size = int(params.get("rows", 2))
+        start = (params["page"] - 1) * size
+        items = list(range(start, min(start + size, count)))
+
+        if not wrap:
+            return items
+
+        return {"items": items, "total": count} if total else {"items": items}
+
+    transport = StaticTransport({URL: page})
+    module.transport = transport
+
+    return transport
+
+
+def pages(transport: StaticTransport) -> list[int]:
+    return sorted(call["params"]["page"] for call in transport.calls)
+
+
+def values(results: list[dict]) -> list:
+    return [result["value"] for result in results]
+
+
+def test_stops_at_empty_page(make_module):
+    module = make_paginated(make_module, items="items", max_pages=10)
+    transport = serve(module, 4)
+
+    assert values(module.search("milk", None)) == [0, 1, 2, 3]
+    assert pages(transport) == [1, 2, 3]
+
+
+def test_stops_at_short_page(make_module):
+    module = make_paginated(make_module, items="items", page_size=2, page_size_param="rows", max_pages=10)
+    transport = serve(module, 5)
+
+    assert values(module.search("milk", None)) == [0, 1, 2, 3, 4]
+    assert pages(transport) == [1, 2, 3]
+    assert all(call["params"]["rows"] == 2 for call in transport.calls)
+
+
+def test_stops_at_total(make_module):
+    module = make_paginated(make_module, items="items", total="total", page_size=2, max_pages=10, concurrency=10)
+    transport = serve(module, 4, total=True)
+
+    assert values(module.search("milk", None)) == [0, 1, 2, 3]
+
+    # the total is only known after the first round, so all of its pages are requested
+    assert pages(transport) == list(range(1, 11))
+
+    transport.calls.clear()
+    module = make_paginated(make_module, items="items", total="total", page_size=2, max_pages=10)
+    module.transport = transport
+
+    assert values(module.search("milk", None)) == [0, 1, 2, 3]
+    assert pages(transport) == [1, 2]
+
+
+def test_stops_at_max_pages(make_module):
+    module = make_paginated(make_module, items="items", max_pages=3, concurrency=2, first_page=2)
+    transport = serve(module, 100)
+
+    assert values(module.search("milk", None)) == [2, 3, 4, 5, 6, 7]
+    assert pages(transport) == [2, 3, 4]
+
+
+def test_pages_without_items(make_module):
+    module = make_paginated(make_module, max_pages=10)
+    transport = serve(module, 3, wrap=False)
+
+    # without `items` the page responses are saved, pagination stops at an empty one
+    assert values(module.search("milk", None)) == [[0, 1], [2], []]
+    assert pages(transport) == [1, 2, 3]
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_async_matches_sync(make_module, concurrency):
+    module = make_paginated(make_module, items="items", page_size=2, max_pages=10, concurrency=concurrency)
+    serve(module, 7)
+
+    assert asyncio.run(module.search_async("milk", None)) == module.search("milk", None)
+
+
+def test_invalid_max_pages(make_module):
+    with pytest.raises(ValueError):
+        make_paginated(make_module, max_pages=0)
@@ -0,0 +1,107 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from trackr.core.module import SearchModule
+from trackr.core.ratelimit import HostLimiter, RateLimitedTransport, parse_retry_after
+from trackr.core.transport import StaticTransport, TransportResponse
+
+
+MAIN = """
+actions:
+  - action: request
+    args:
+      save_to: response
+      url: {url}
+result_mapping:
+  attribute: response.items
+  mapping:
+    name: name
+"""
+
+
+@pytest.fixture
+def unavailable_server():
+    """Local server answering every request with 503, counting the requests."""
+
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield f"http://127.0.0.1:{server.server_address[1]}/", hits
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("rate_limit", [False, True])
+def test_unavailable_upstream_is_retried_once_per_attempt(make_module, unavailable_server, rate_limit):
+    url, hits = unavailable_server
+    trackr = """
+        transport:
+          retries: 2
+          backoff: 0
+    """
+
+    if rate_limit:
+        trackr += """
+        rate_limit:
+          rate: 100
+          retries: 2
+          backoff: 0.01
+        """
+
+    module = SearchModule.from_yaml(str(make_module(MAIN.format(url=url), trackr=trackr)))
+
+    with pytest.raises(ValueError, match="503"):
+        module.search("milk", 1)
+
+    # one request plus two retries, either by the transport or by the limiter
+    assert len(hits) == 3
+
+
+def test_limiter_backs_off_and_recovers():
+    limiter = HostLimiter("example.com", rate=1000, concurrency=8, backoff=0)
+
+    first, second = limiter.acquire(), limiter.acquire()
+    limiter.release(first, 429)
+
+    assert (limiter.rate, limiter.concurrency, limiter.throttled) == (500, 4, 1)
+
+    # responses to requests started before the decrease don't decrease it again
+    limiter.release(second, 503)
+    assert (limiter.rate, limiter.concurrency, limiter.throttled) == (500, 4, 2)
+
+    for _ in range(100):
+        limiter.release(limiter.acquire(), 200)
+
+    assert (limiter.rate, limiter.concurrency) == (1000, 8)
+
+
+def test_rate_limited_transport_retries_throttled_responses():
+    responses = iter([TransportResponse(429, b"null", {"Retry-After": "0"}), TransportResponse(200, b"[]")])
+    transport = StaticTransport({"https://throttled.example.com/": lambda **_: next(responses)})
+
+    limited = RateLimitedTransport(transport, {"rate": 100, "retries": 1})
+
+    assert limited.request("GET", "https://throttled.example.com/").status_code == 200
+    assert len(transport.calls) == 2
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"retry-after": "2"}) == 2.0
+    assert parse_retry_after({"Retry-After": "3600"}) == 60.0
+    assert parse_retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) is None
+    assert parse_retry_after({}) is None
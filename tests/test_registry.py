@@ -0,0 +1,78 @@
+import os
+
+from trackr.cli.compiler import compile_module
+from trackr.core.registry import ModuleRegistry
+
+
+MAIN = """
+initialize:
+  attributes:
+    items: [1, 2]
+actions: []
+result_mapping:
+  attribute: items
+  mapping:
+    value: !dynamic type="computed" value="item"
+"""
+
+
+def touch_later(path) -> None:
+    # mtimes may not change within the filesystem's resolution
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_compiled_module_wins(make_module):
+    path = make_module(MAIN)
+    compile_module(str(path))
+
+    registry = ModuleRegistry(str(path.parent), check_interval=0)
+
+    assert registry.names == ["test"]
+    assert registry.get("test")._file_path.endswith(".yaml.ysm")
+
+
+def test_source_change_reloads_compiled_module(make_module):
+    path = make_module(MAIN)
+    compile_module(str(path))
+
+    registry = ModuleRegistry(str(path.parent), check_interval=0)
+    module = registry.get("test")
+
+    assert module.id == "test"
+
+    make_module(MAIN, id="edited", name="test")
+    touch_later(path)
+
+    reloaded = registry.get("test")
+
+    assert reloaded is not module
+    assert reloaded.id == "edited"
+    assert reloaded._file_path == str(path)
+
+    # recompiling switches back to the compiled module
+    compile_module(str(path))
+    touch_later(f"{path}.ysm")
+
+    assert registry.get("test")._file_path == f"{path}.ysm"
+
+
+def test_stale_compiled_module_loads_source(make_module):
+    path = make_module(MAIN)
+    compile_module(str(path))
+    make_module(MAIN, id="edited", name="test")
+
+    registry = ModuleRegistry(str(path.parent), check_interval=0)
+
+    assert registry.get("test").id == "edited"
+
+
+def test_compiled_module_without_sources(make_module):
+    path = make_module(MAIN)
+    compile_module(str(path))
+    path.unlink()
+
+    registry = ModuleRegistry(str(path.parent), check_interval=0)
+
+    assert registry.get("test").id == "test"
+    assert registry.get("test").search("milk", None) == [{"value": 1}, {"value": 2}]
@@ -0,0 +1,131 @@
+import json, threading
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from trackr.cli.server import SearchService, create_server
+from trackr.core.transport import StaticTransport
+
+
+MAIN = """
+initialize:
+  attributes:
+    items: [1, 2]
+actions: []
+result_mapping:
+  attribute: items
+  mapping:
+    value: !dynamic type="computed" value="item"
+    location: !dynamic type="attribute" value="$location"
+"""
+
+
+@pytest.fixture
+def make_server(make_module):
+    started = []
+
+    def make_server(main: str = MAIN, trackr: str = "") -> ThreadingHTTPServer:
+        path = make_module(main, trackr=trackr)
+        service = SearchService(str(path.parent), workers=2)
+        server = create_server(service, port=0)
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True).start()
+        started.append((server, service))
+
+        return server
+
+    yield make_server
+
+    for server, service in started:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+@pytest.fixture
+def server(make_server):
+    return make_server()
+
+
+def get(server, path: str) -> tuple[int, dict]:
+    connection = HTTPConnection(*server.server_address, timeout=5)
+
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def post(server, body) -> tuple[int, dict]:
+    connection = HTTPConnection(*server.server_address, timeout=5)
+
+    try:
+        connection.request("POST", "/search", json.dumps(body), {"Content-Type": "application/json"})
+        response = connection.getresponse()
+
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_search(server):
+    status, data = post(server, {"query": "milk", "location": 1, "timeout": "5"})
+
+    assert status == 200
+    assert data["modules"]["test"]["results"] == [{"value": 1, "location": 1}, {"value": 2, "location": 1}]
+
+
+@pytest.mark.parametrize("body", [
+    {"query": "milk", "location": 1, "timeout": [1]},
+    {"query": "milk", "location": 1, "timeout": "soon"},
+    {"query": "milk", "location": 1, "timeout": "inf"},
+    {"query": "milk", "location": 1, "timeout": 1e400},
+    {"query": "milk", "location": 1, "timeout": "nan"},
+    {"query": "milk", "location": 1, "timeout": -1},
+    {"query": "milk", "location": 1, "timeout": 0},
+    {"query": "milk", "location": 1, "modules": 1},
+    {"query": "milk", "location": 1, "modules": [{"id": "test"}]},
+    {"query": "milk", "location": 1, "modules": ["unknown"]},
+    {"location": 1},
+])
+def test_invalid_request(server, body):
+    status, data = post(server, body)
+
+    assert status == 400
+    assert data["error"]
+
+
+@pytest.mark.parametrize("timeout", ["inf", "nan", "-1"])
+def test_invalid_timeout_query(server, timeout):
+    status, data = get(server, f"/search?query=milk&location=1&timeout={timeout}")
+
+    assert status == 400
+    assert "timeout" in data["error"]
+
+
+def test_stats_include_cache(make_server):
+    url = "https://example.com/search"
+    server = make_server(f"""
+        actions:
+          - action: request
+            args:
+              save_to: response
+              url: {url}
+        result_mapping:
+          attribute: response
+          mapping:
+            value: !dynamic type="computed" value="item"
+    """, trackr="cache: {ttl: 60}")
+
+    server.RequestHandlerClass.service.registry.get("test").transport = StaticTransport({url: [1, 2]})
+
+    for _ in range(2):
+        assert post(server, {"query": "milk", "location": 1})[0] == 200
+
+    status, data = get(server, "/stats")
+
+    assert status == 200
+    assert data["modules"]["test"]["cache"] == {"hits": 1, "misses": 1, "evictions": 0, "hit_rate": 0.5}
@@ -0,0 +1,141 @@
+import threading, time
+
+import pytest
+
+from trackr.core.metrics import add_hook, remove_hook
+from trackr.core.module import SearchModule
+from trackr.core.singleflight import SingleFlight
+from trackr.core.transport import StaticTransport
+
+
+URL = "https://example.com/search"
+
+MAIN = f"""
+actions:
+  - action: request
+    args:
+      save_to: response
+      url: {URL}
+      params:
+        query: !dynamic type="attribute" value="$query"
+result_mapping:
+  attribute: response.items
+  mapping:
+    name: name
+"""
+
+
+def wait_for(condition) -> None:
+    deadline = time.monotonic() + 5
+
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def metrics():
+    collected = []
+    add_hook(collected.append)
+
+    yield collected
+
+    remove_hook(collected.append)
+
+
+def test_single_flight_shares_result_and_error():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        release.wait(5)
+
+        if value == "error":
+            raise ValueError(value)
+
+        return value
+
+    for value in ["result", "error"]:
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(flights.do(value, slow, value))
+            except ValueError as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+
+        for thread in threads:
+            thread.start()
+
+        wait_for(lambda: flights.calls == (3 if value == "result" else 6))
+        release.set()
+
+        for thread in threads:
+            thread.join()
+
+        release.clear()
+
+        if value == "result":
+            assert sorted(outcomes, key=lambda outcome: outcome[1]) == [("result", False), ("result", True), ("result", True)]
+        else:
+            assert len(outcomes) == 3 and all(isinstance(outcome, ValueError) for outcome in outcomes)
+
+    assert calls == ["result", "error"]
+
+    # nothing is cached once a call returned
+    release.set()
+    assert flights.do("result", slow, "result") == ("result", False)
+
+
+def test_coalesced_searches(make_module, metrics):
+    module = SearchModule.from_yaml(str(make_module(MAIN, trackr="coalesce: true")))
+    release = threading.Event()
+
+    def respond(**_):
+        release.wait(5)
+        return {"items": [{"name": "milk"}, {"name": "bread"}]}
+
+    transport = StaticTransport({URL: respond})
+    module.transport = transport
+
+    results = [None, None]
+
+    def search(index: int) -> None:
+        results[index] = module.search("milk", 1)
+
+    threads = [threading.Thread(target=search, args=(index,)) for index in range(2)]
+    threads[0].start()
+    wait_for(lambda: transport.calls)
+    threads[1].start()
+    wait_for(lambda: module.flights.coalesced == 1)
+    release.set()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(transport.calls) == 1
+    assert results[0] == results[1] == [{"name": "milk"}, {"name": "bread"}]
+
+    # every caller owns its results
+    assert results[0][0] is not results[1][0]
+    results[0][0]["name"] = "changed"
+    assert results[1][0]["name"] == "milk"
+
+    # both searches are reported, the joined one without the work of the leader
+    assert sorted(m.coalesced for m in metrics) == [False, True]
+    leader, follower = sorted(metrics, key=lambda m: m.coalesced)
+    assert leader.counters["requests"] == 1
+    assert not follower.counters and [span.name for span in follower.spans] == ["search"]
+
+
+def test_coalescing_is_opt_in(make_module):
+    module = SearchModule.from_yaml(str(make_module(MAIN)))
+    module.transport = StaticTransport({URL: {"items": []}})
+
+    assert not module.coalesce
+    assert module.search("milk", 1) == []
+    assert module._flights is None
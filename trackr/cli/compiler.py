@@ -1,5 +1,8 @@
-import logging, pickle
+import logging, os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
+from trackr.core.compiled import ModuleFile
 from trackr.core.module import SearchModule
 from trackr import MODULE_FILE_EXTENSION
 
@@ -7,22 +10,70 @@ from trackr import MODULE_FILE_EXTENSION
 logger = logging.getLogger(__name__)
 
 
-def compile_module(file_path: str,  output_path: str = None) -> None:
+def is_up_to_date(output_path: str) -> bool:
+    if not os.path.exists(output_path):
+        return False
+
+    try:
+        return ModuleFile(output_path).is_up_to_date()
+    except (ValueError, OSError):
+        return False
+
+
+def compile_module(file_path: str,  output_path: str = None, force: bool = False) -> bool:
     logger.info(f'Compiling search module: {file_path}')
     logger.debug(f' {output_path=}')
 
+    if output_path is None:
+        output_path = f'{file_path}{MODULE_FILE_EXTENSION}'
+
+        logger.info(f'No output path was specified, using default: {output_path}')
+
+    if not force and is_up_to_date(output_path):
+        logger.info(f'Module is up to date, skipping: {output_path}')
+        return False
+
     try:
         module = SearchModule.from_yaml(file_path, is_compilation=True)
     except Exception as e:
         logger.error(f'Failed to compile module: {file_path}')
         logger.exception(e)
-        return
+        return False
 
-    if output_path is None:
-        output_path = f'{file_path}{MODULE_FILE_EXTENSION}'
+    ModuleFile.write(module, output_path, module.source_files)
+    logger.info(f'Compiled module saved to: {output_path}')
 
-        logger.info(f'No output path was specified, using default: {output_path}')
+    return True
+
+
+def compile_directory(directory: str, output_directory: str = None, jobs: int = None, force: bool = False) -> int:
+    """Compile every module YAML in a directory, skipping modules whose compiled
+    file is up to date. Modules are compiled in parallel worker processes.
+
+    Returns:
+        int: The number of compiled modules.
+    """
+
+    output_directory = Path(output_directory or directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+
+    pending = []
+
+    for file_path in sorted(Path(directory).glob('*.yaml')):
+        output_path = output_directory / f'{file_path.name}{MODULE_FILE_EXTENSION}'
+
+        if not force and is_up_to_date(str(output_path)):
+            logger.info(f'Module is up to date, skipping: {output_path}')
+            continue
+
+        pending.append((str(file_path), str(output_path)))
+
+    logger.info(f'Compiling {len(pending)} modules from: {directory}')
+
+    if not pending:
+        return 0
+
+    with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count(), len(pending))) as executor:
+        futures = [executor.submit(compile_module, file_path, output_path, True) for file_path, output_path in pending]
 
-    with open(output_path, 'wb') as file:
-        pickle.dump(module, file)
-        logger.info(f'Compiled module saved to: {output_path}')
+        return sum(future.result() for future in futures)
@@ -10,8 +10,52 @@ logger = logging.getLogger(__name__)
 def compile_argument_group():
     group = argparse.ArgumentParser(add_help=False)
 
-    group.add_argument("module", type=str, help="path to search module")
-    group.add_argument("-o", "--output", type=str, help="path to output file")
+    group.add_argument("module", type=str, help="path to search module or a directory of modules")
+    group.add_argument("-o", "--output", type=str, help="path to output file or directory")
+    group.add_argument("-j", "--jobs", type=int, help="number of parallel compile processes")
+    group.add_argument("-f", "--force", action="store_true", help="compile unchanged modules too")
+
+    return group
+
+
+def search_argument_group():
+    group = argparse.ArgumentParser(add_help=False)
+
+    group.add_argument("module", type=str, help="path to search module, compiled module or a directory of modules")
+    group.add_argument("query", type=str, help="search query")
+    group.add_argument("location", type=str, help="location (store id) to search in, comma separated for several")
+    group.add_argument("-n", "--repeat", type=int, default=1, help="number of times to run the search")
+    group.add_argument("-t", "--timeout", type=float, default=10.0, help="per-module timeout in seconds")
+
+    return group
+
+
+def serve_argument_group():
+    group = argparse.ArgumentParser(add_help=False)
+
+    group.add_argument("directory", type=str, help="directory of search modules")
+    group.add_argument("-H", "--host", type=str, default="127.0.0.1", help="address to listen on")
+    group.add_argument("-P", "--port", type=int, default=8080, help="port to listen on")
+    group.add_argument("-w", "--workers", type=int, help="number of search worker threads")
+    group.add_argument("-c", "--concurrency", type=int, default=4, help="concurrent searches per module")
+    group.add_argument("-t", "--timeout", type=float, default=10.0, help="per-module timeout in seconds")
+    group.add_argument("--compile", action="store_true", help="compile changed modules before serving")
+
+    return group
+
+
+def batch_argument_group():
+    group = argparse.ArgumentParser(add_help=False)
+
+    group.add_argument("directory", type=str, help="directory of search modules")
+    group.add_argument("-o", "--output", type=str, required=True, help="path to JSONL output, also used to resume")
+    group.add_argument("-i", "--input", type=str, help="path to JSONL jobs with module, query and location")
+    group.add_argument("-Q", "--query", type=str, action="append", default=[], help="query to run at every store")
+    group.add_argument("--queries", type=str, help="path to a file with one query per line")
+    group.add_argument("-m", "--module", type=str, action="append", default=[], help="module to expand queries for")
+    group.add_argument("-c", "--concurrency", type=int, default=8, help="number of concurrent searches")
+    group.add_argument("--restart", action="store_true", help="overwrite the output instead of resuming")
+    group.add_argument("--compact", action="store_true", help="write results by column, storing constant fields once")
 
     return group
 
@@ -27,22 +71,125 @@ def parse_args():
     )
     parser.add_argument("-l", "--log", type=str, help="path to log file")
     parser.add_argument("-q", "--quiet", action="store_true", help="disable output")
+    parser.add_argument(
+        "-p", "--profile", action="store_true", help="print a timing breakdown of every search"
+    )
 
     subparsers = parser.add_subparsers(dest="command", required=True)
     subparsers.add_parser(
         "compile", parents=[compile_argument_group()], help="compile a search module"
     )
+    subparsers.add_parser(
+        "search", parents=[search_argument_group()], help="run a search with a module"
+    )
+    subparsers.add_parser(
+        "serve", parents=[serve_argument_group()], help="serve searches over HTTP"
+    )
+    subparsers.add_parser(
+        "batch", parents=[batch_argument_group()], help="run many searches and write the results to JSONL"
+    )
 
     return parser.parse_args()
 
 
 def compile(args):
-    from trackr.cli.compiler import compile_module
+    import os
+    from trackr.cli.compiler import compile_module, compile_directory
+
+    if os.path.isdir(args.module):
+        compile_directory(args.module, args.output, args.jobs, args.force)
+    else:
+        compile_module(args.module, args.output, args.force)
 
-    compile_module(args.module, args.output)
+
+def parse_location(location: str):
+    # store ids are numbers for some modules and zero padded strings for others
+    return int(location) if location.isdigit() and str(int(location)) == location else location
+
+
+def search(args):
+    import json, os
+    from trackr import MODULE_FILE_EXTENSION
+    from trackr.core.module import SearchModule
+
+    locations = [parse_location(location) for location in args.location.split(",") if location]
+    location = locations[0] if len(locations) == 1 else locations
+
+    if os.path.isdir(args.module):
+        from trackr.core.engine import SearchEngine
+        from trackr.core.registry import ModuleRegistry
+        from trackr.core.utility import error_exit
+
+        if isinstance(location, list):
+            error_exit(logger, "several locations can only be searched with a single module")
+
+        with SearchEngine.from_registry(ModuleRegistry(args.module), timeout=args.timeout) as engine:
+            for _ in range(args.repeat):
+                results = {
+                    result.module_id: result.results if result.ok else {"error": repr(result.error)}
+                    for result in engine.search(args.query, location)
+                }
+    else:
+        if args.module.endswith(MODULE_FILE_EXTENSION):
+            module = SearchModule.from_compiled(args.module)
+        else:
+            module = SearchModule.from_yaml(args.module)
+
+        for _ in range(args.repeat):
+            if isinstance(location, list):
+                results = module.search_many(args.query, location)
+            else:
+                results = module.search(args.query, location)
+
+    print(json.dumps(results, ensure_ascii=False, indent=2, default=str))
+
+
+def serve(args):
+    from trackr.cli.server import serve
+
+    if args.compile:
+        from trackr.cli.compiler import compile_directory
+
+        compile_directory(args.directory)
+
+    serve(args.directory, args.host, args.port, args.workers, args.concurrency, args.timeout)
+
+
+def batch(args):
+    import itertools
+    from trackr.core.batch import BatchRunner, read_jobs, expand_jobs
+    from trackr.core.registry import ModuleRegistry
+    from trackr.core.utility import error_exit
+
+    registry = ModuleRegistry(args.directory)
+    queries = list(args.query)
+
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as file:
+            queries.extend(line.strip() for line in file if line.strip())
+
+    if args.input:
+        jobs = read_jobs(args.input)
+    elif queries:
+        jobs = itertools.chain.from_iterable(
+            expand_jobs(registry.get(module_id), queries) for module_id in args.module or registry.names
+        )
+    else:
+        error_exit(logger, "either --input or queries must be specified")
+
+    stats = BatchRunner(registry.get, args.concurrency, args.compact).run(jobs, args.output, resume=not args.restart)
+    logger.info(f"Batch results written to: {args.output} ({stats})")
+
+
+def print_profile(metrics):
+    import sys
+
+    print(metrics.format(), file=sys.stderr)
 
 
 def cli_main():
+    logging.basicConfig(format=LOGGING_FORMAT, level=logging.INFO)
+
     args = parse_args()
 
     if args.debug:
@@ -57,5 +204,16 @@ def cli_main():
     if args.quiet:
         logging.getLogger().setLevel(logging.ERROR)
 
+    if args.profile:
+        from trackr.core.metrics import add_hook
+
+        add_hook(print_profile)
+
     if args.command == "compile":
         compile(args)
+    elif args.command == "search":
+        search(args)
+    elif args.command == "serve":
+        serve(args)
+    elif args.command == "batch":
+        batch(args)
@@ -0,0 +1,300 @@
+import json, logging, math, threading, time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from trackr import __version__
+from trackr.cli.main import parse_location
+from trackr.core.engine import SearchEngine, SearchResult
+from trackr.core.ratelimit import get_limiters
+from trackr.core.registry import ModuleRegistry
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_MODULE_CONCURRENCY = 4
+LATENCY_WINDOW = 1024
+
+
+class LatencyStats:
+    """Request counters and latency percentiles over the most recent requests."""
+
+    count: int = 0
+    errors: int = 0
+    timeouts: int = 0
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, elapsed: float, error: BaseException = None) -> None:
+        with self._lock:
+            self.count += 1
+            self._latencies.append(elapsed)
+
+            if isinstance(error, TimeoutError):
+                self.timeouts += 1
+            elif error is not None:
+                self.errors += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        def percentile(fraction: float) -> float | None:
+            if not latencies:
+                return None
+
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000, 3)
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "p50_ms": percentile(0.50),
+            "p90_ms": percentile(0.90),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(latencies[-1] * 1000, 3) if latencies else None,
+        }
+
+
+class SearchService:
+    """Searches the modules of a directory on behalf of many clients.
+
+    Modules are loaded once through a `ModuleRegistry` (compiled modules are
+    preferred and changed files are reloaded), searches run on the bounded
+    worker pool of a `SearchEngine` and at most `module_concurrency` searches
+    run against one module at a time.
+    """
+
+    registry: ModuleRegistry = None
+    engine: SearchEngine = None
+    started: float = None
+
+    requests: LatencyStats = None
+    modules: dict[str, LatencyStats] = None
+
+    def __init__(
+        self,
+        directory: str,
+        workers: int = None,
+        module_concurrency: int = DEFAULT_MODULE_CONCURRENCY,
+        timeout: float = 10.0,
+        check_interval: float = 1.0,
+    ) -> None:
+        self.registry = ModuleRegistry(directory, check_interval=check_interval)
+        self.engine = SearchEngine.from_registry(
+            self.registry, timeout=timeout, max_workers=workers, module_concurrency=module_concurrency
+        )
+        self.started = time.time()
+
+        self.requests = LatencyStats()
+        self.modules = {}
+
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.registry}>"
+
+    def preload(self) -> list[str]:
+        names = list(self.registry.load_all().keys())
+        logger.info(f"Preloaded {len(names)} modules: {', '.join(names)}")
+
+        return names
+
+    def _module_stats(self, module_id: str) -> LatencyStats:
+        with self._lock:
+            return self.modules.setdefault(module_id, LatencyStats())
+
+    def _format_result(self, result: SearchResult) -> dict:
+        return {
+            "ok": result.ok,
+            "elapsed": round(result.elapsed, 6) if result.elapsed is not None else None,
+            "results": result.results if result.ok else [],
+            "error": None if result.ok else f"{result.error.__class__.__name__}: {result.error}",
+        }
+
+    def search(self, query: str, location: Any, modules: list[str] = None, timeout: float = None) -> dict:
+        """Search some or all modules, `location` may be a dict keyed by module id."""
+
+        if not query:
+            raise ValueError("missing query")
+
+        if location is None or location == "":
+            raise ValueError("missing location")
+
+        if modules:
+            unknown = [module_id for module_id in modules if module_id not in self.registry]
+
+            if unknown:
+                raise ValueError(f"unknown modules: {', '.join(unknown)}")
+
+            if not isinstance(location, dict):
+                location = {module_id: location for module_id in modules}
+            else:
+                location = {key: value for key, value in location.items() if key in modules}
+
+        start = time.perf_counter()
+        results = {}
+
+        for result in self.engine.search(query, location, timeout):
+            self._module_stats(result.module_id).record(result.elapsed or 0.0, result.error)
+            results[result.module_id] = self._format_result(result)
+
+        elapsed = time.perf_counter() - start
+        self.requests.record(elapsed)
+
+        return {"query": query, "location": location, "elapsed": round(elapsed, 6), "modules": results}
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "version": __version__,
+            "uptime": round(time.time() - self.started, 3),
+            "modules": self.registry.names,
+        }
+
+    def statistics(self) -> dict:
+        with self._lock:
+            modules = dict(self.modules)
+
+        caches = {
+            module_id: module.cache.stats.as_dict()
+            for module_id, module in self.registry.loaded().items()
+            if module.cache is not None
+        }
+
+        return {
+            "uptime": round(time.time() - self.started, 3),
+            "requests": self.requests.as_dict(),
+            "modules": {
+                module_id: {**stats.as_dict(), "cache": caches.get(module_id, None)}
+                for module_id, stats in sorted(modules.items())
+            },
+            "rate_limits": {host: limiter.as_dict() for host, limiter in sorted(get_limiters().items())},
+        }
+
+    def close(self) -> None:
+        self.engine.close()
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    """JSON API of a `SearchService`.
+
+        GET  /health
+        GET  /stats
+        GET  /search?query=...&location=...[&modules=a,b][&timeout=5]
+        POST /search {"query": ..., "location": ..., "modules": [...], "timeout": ...}
+    """
+
+    service: SearchService = None
+    server_version = f"trackr/{__version__}"
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status: int, data: Any) -> None:
+        body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _search(self, query: str, location: Any, modules: Any, timeout: Any) -> None:
+        if isinstance(modules, str):
+            modules = [module for module in modules.split(",") if module]
+
+        # JSON bodies may hold values of any type, infinite timeouts overflow the deadline math
+        try:
+            timeout = float(timeout) if timeout is not None else None
+        except (TypeError, ValueError):
+            self._send_json(400, {"error": f"invalid timeout: {timeout!r}"})
+            return
+
+        if timeout is not None and not (math.isfinite(timeout) and timeout > 0):
+            self._send_json(400, {"error": f"timeout must be a positive number of seconds: {timeout!r}"})
+            return
+
+        if modules is not None and not (isinstance(modules, list) and all(isinstance(module, str) for module in modules)):
+            self._send_json(400, {"error": "modules must be a list of module ids"})
+            return
+
+        try:
+            self._send_json(200, self.service.search(query, location, modules, timeout))
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/health":
+            self._send_json(200, self.service.health())
+        elif url.path == "/stats":
+            self._send_json(200, self.service.statistics())
+        elif url.path == "/search":
+            location = params.get("location", None)
+
+            self._search(
+                params.get("query", params.get("q", None)),
+                parse_location(location) if location is not None else None,
+                params.get("modules", None),
+                params.get("timeout", None),
+            )
+        else:
+            self._send_json(404, {"error": f"not found: {url.path}"})
+
+    def do_POST(self) -> None:
+        if urlsplit(self.path).path != "/search":
+            self._send_json(404, {"error": f"not found: {self.path}"})
+            return
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "invalid JSON body"})
+            return
+
+        if not isinstance(body, dict):
+            self._send_json(400, {"error": "body must be a JSON object"})
+            return
+
+        self._search(body.get("query", None), body.get("location", None), body.get("modules", None), body.get("timeout", None))
+
+
+def create_server(service: SearchService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    handler = type("BoundSearchRequestHandler", (SearchRequestHandler,), {"service": service})
+
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+
+    return server
+
+
+def serve(
+    directory: str,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    workers: int = None,
+    module_concurrency: int = DEFAULT_MODULE_CONCURRENCY,
+    timeout: float = 10.0,
+) -> None:
+    service = SearchService(directory, workers, module_concurrency, timeout)
+    service.preload()
+
+    server = create_server(service, host, port)
+    logger.info(f"Serving {directory} on http://{host}:{server.server_address[1]}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        server.server_close()
+        service.close()
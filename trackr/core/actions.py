@@ -1,8 +1,55 @@
 from abc import abstractmethod, ABC  # noqa
-import requests
+import contextvars, math, threading
+from typing import Any
 
-from .constructors import DynamicConstructor, compute_dynamic_attributes
-from .utility import set_by_dot_path, has_keys
+from .constructors import DynamicConstructor, collect_references, resolve_dynamic_attributes
+from .utility import DotPath, replace_by_dot_path, has_keys
+
+
+DEFAULT_MAX_PAGES = 5
+PAGE_WORKERS = 32
+
+_page_executor = None
+_page_executor_lock = threading.Lock()
+
+
+def _get_page_executor():
+    global _page_executor
+
+    with _page_executor_lock:
+        if _page_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            _page_executor = ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix="trackr-page")
+
+        return _page_executor
+
+
+def merge_location_responses(responses: list) -> Any:
+    """Merge the responses of a request sent once per location.
+
+    Lists are concatenated in location order, dropping repeated hashable
+    items, other responses are returned as the list of responses.
+    """
+
+    if not all(isinstance(response, list) for response in responses):
+        return responses
+
+    merged, seen = [], set()
+
+    for response in responses:
+        for item in response:
+            try:
+                if item in seen:
+                    continue
+
+                seen.add(item)
+            except TypeError:
+                pass
+
+            merged.append(item)
+
+    return merged
 
 
 class Action:
@@ -26,8 +73,31 @@ class Action:
     def __call__(self, parent: object) -> None:
         pass
 
+    async def run_async(self, parent: object) -> None:
+        self(parent)
+
+    @property
+    def inputs(self) -> set[str]:
+        """Top level attribute names read by this action."""
+
+        return collect_references(self.args)
+
+    @property
+    def outputs(self) -> set[str]:
+        """Top level attribute names written by this action."""
+
+        return set()
+
 
 class UpdateAttributeAction(Action):
+    @property
+    def inputs(self) -> set[str]:
+        return super().inputs | self.outputs
+
+    @property
+    def outputs(self) -> set[str]:
+        return {self.args["attribute"]} if "attribute" in self.args else set()
+
     def __call__(self, parent: object) -> None:
         if not hasattr(parent, "attributes") or not isinstance(parent.attributes, dict):
             raise ValueError("parent must have attributes dict")
@@ -41,46 +111,357 @@ class UpdateAttributeAction(Action):
         if values is None or not isinstance(values, dict):
             raise ValueError("invalid value parameter")
 
+        target = parent.attributes[attribute]
+
         for key, value in values.items():
             if isinstance(value, DynamicConstructor):
                 value = value(parent)
 
-            set_by_dot_path(parent.attributes[attribute], key, value)
+            target = replace_by_dot_path(target, key, value)
+
+        parent.attributes[attribute] = target
 
 
 class RequestAction(Action):
-    def __call__(self, parent: object) -> None:
+    """Sends a request and saves the decoded JSON response to `save_to`.
+
+    With `per_location` set, searches of several locations send the request
+    once per location in `$locations`, each with `$location` set to it, and
+    save the responses merged by `merge_location_responses`.
+    """
+
+    @property
+    def outputs(self) -> set[str]:
+        return {str(self.args["save_to"]).split(".")[0]} if "save_to" in self.args else set()
+
+    def _prepare_request(self, parent: object) -> tuple[str, dict]:
         if not has_keys(self.args, ["url", "save_to"]):
             raise ValueError("URL and save_to must be specified.")
 
         if not hasattr(parent, "attributes") or not isinstance(parent.attributes, dict):
             raise ValueError("parent must have attributes dict")
 
-        compute_dynamic_attributes(parent, self.args)
+        args = resolve_dynamic_attributes(parent, self.args)
 
-        url = self.args.get("url")
-        method = self.args.get("method", "GET")
-        headers = self.args.get("headers", {})
-        save_to = self.args.get("save_to")
-        params = self.args.get("params", {})
+        url = args.get("url")
+        method = args.get("method", "GET")
+        headers = args.get("headers", {})
+        save_to = args.get("save_to")
+        params = args.get("params", {})
 
-        if method == "GET":
-            response = requests.get(url, headers=headers, params=params)
-        elif method == "POST":
-            response = requests.post(url, headers=headers, params=params)
-        else:
+        if method not in ("GET", "POST"):
             raise ValueError("Method must be GET or POST.")
 
+        if save_to is None:
+            raise ValueError("Save_to must be specified.")
+
+        return save_to, {
+            "method": method,
+            "url": url,
+            "headers": headers,
+            "params": params,
+            "timeout": args.get("timeout"),
+        }
+
+    def _decode_response(self, parent: object, response) -> Any:
+        parent.metrics.count("requests")
+        parent.metrics.count("bytes_received", len(response.content or b""))
+
         if response.status_code != 200:
             raise ValueError(f"Request failed with status code: {response.status_code}")
 
-        if save_to is None:
-            raise ValueError("Save_to must be specified.")
+        with parent.metrics.span("decode"):
+            return response.json()
+
+    def _location_views(self, parent: object) -> list | None:
+        """Contexts of the locations requested separately, None if the request is sent once."""
+
+        locations = parent.attributes.get("$locations") or []
+
+        if not self.args.get("per_location", False) or len(locations) < 2:
+            return None
+
+        return [parent.at_location(location) for location in locations]
+
+    def _fetch(self, parent: object) -> tuple[str, Any]:
+        with parent.metrics.span("prepare"):
+            save_to, request = self._prepare_request(parent)
+
+        with parent.metrics.span("http", url=request["url"]):
+            response = parent.transport.request(**request)
+
+        return save_to, self._decode_response(parent, response)
+
+    async def _fetch_async(self, parent: object) -> tuple[str, Any]:
+        with parent.metrics.span("prepare"):
+            save_to, request = self._prepare_request(parent)
+
+        with parent.metrics.span("http", url=request["url"]):
+            response = await parent.transport.request_async(**request)
+
+        return save_to, self._decode_response(parent, response)
+
+    def __call__(self, parent: object) -> None:
+        if (views := self._location_views(parent)) is None:
+            parent.set(*self._fetch(parent))
+            return
+
+        # the requests never wait for other requests, so they share the page workers
+        executor = _get_page_executor()
+        futures = [executor.submit(contextvars.copy_context().run, self._fetch, view) for view in views]
+        fetched = [future.result() for future in futures]
+
+        parent.set(fetched[0][0], merge_location_responses([data for _, data in fetched]))
+
+    async def run_async(self, parent: object) -> None:
+        import asyncio
+
+        if (views := self._location_views(parent)) is None:
+            parent.set(*await self._fetch_async(parent))
+            return
+
+        fetched = await asyncio.gather(*[self._fetch_async(view) for view in views])
+
+        parent.set(fetched[0][0], merge_location_responses([data for _, data in fetched]))
+
+
+class PaginateAction(RequestAction):
+    """Request action fetching several pages concurrently.
+
+    Takes the args of `request` and:
+
+        page_param       query param of the page number, defaults to `page`
+        first_page       number of the first page, defaults to 1
+        page_size        number of items per page
+        page_size_param  query param the page size is sent in, if any
+        max_pages        page cap, defaults to 5
+        concurrency      number of pages requested at once, defaults to `max_pages`
+        items            dot path of the items of a page
+        total            dot path of the total number of items
+        per_location     paginate every location in `$locations` separately
+
+    Pages are requested in rounds of `concurrency` pages. Pagination stops at
+    an empty page, a page with less than `page_size` items, once `total` items
+    were fetched or at the page cap. The items of all pages are merged in page
+    order and saved to `save_to`, without `items` the list of page responses
+    is saved instead. With `per_location` the locations are paginated side by
+    side and their merged lists are merged by `merge_location_responses`.
+    """
+
+    def __init__(self, action: str, args: dict) -> None:
+        super().__init__(action, args)
 
-        set_by_dot_path(parent.attributes, save_to, response.json())
+        self.page_param = str(self.args.get("page_param", "page"))
+        self.first_page = int(self.args.get("first_page", 1))
+        self.page_size = int(self.args["page_size"]) if self.args.get("page_size", None) else None
+        self.page_size_param = self.args.get("page_size_param", None)
+        self.max_pages = int(self.args.get("max_pages", DEFAULT_MAX_PAGES))
+        self.concurrency = max(1, int(self.args.get("concurrency", self.max_pages)))
+        self.items_path = DotPath(self.args["items"]) if self.args.get("items", None) else None
+        self.total_path = DotPath(self.args["total"]) if self.args.get("total", None) and self.items_path else None
+
+        if self.max_pages < 1:
+            raise ValueError("max_pages must be at least 1")
+
+    def _page_request(self, request: dict, page: int) -> dict:
+        params = {**(request["params"] or {}), self.page_param: page}
+
+        if self.page_size is not None and self.page_size_param:
+            params[self.page_size_param] = self.page_size
+
+        return {**request, "params": params}
+
+    def _next_pages(self, page: int, merged: list, total: int | None) -> range:
+        count = min(self.concurrency, self.first_page + self.max_pages - page)
+
+        if total is not None and self.page_size:
+            count = min(count, math.ceil((total - len(merged)) / self.page_size))
+
+        return range(page, page + max(count, 0))
+
+    def _merge(self, pages: list, merged: list, total: int | None) -> tuple[bool, int | None]:
+        """Append a round of decoded pages, returns whether pagination is done and the total."""
+
+        for data in pages:
+            if self.items_path is None:
+                merged.append(data)
+
+                if not data:
+                    return True, total
+
+                continue
+
+            if self.total_path is not None and total is None:
+                try:
+                    total = int(self.total_path.get(data))
+                except (TypeError, ValueError):
+                    total = None
+
+            items = self.items_path.get(data) or []
+            merged.extend(items)
+
+            if not items or (self.page_size and len(items) < self.page_size):
+                return True, total
+
+            if total is not None and len(merged) >= total:
+                return True, total
+
+        return False, total
+
+    def _fetch_page(self, parent: object, request: dict, page: int) -> Any:
+        with parent.metrics.span("http", url=request["url"], page=page):
+            response = parent.transport.request(**self._page_request(request, page))
+
+        return self._decode_response(parent, response)
+
+    async def _fetch_page_async(self, parent: object, request: dict, page: int) -> Any:
+        with parent.metrics.span("http", url=request["url"], page=page):
+            response = await parent.transport.request_async(**self._page_request(request, page))
+
+        return self._decode_response(parent, response)
+
+    def __call__(self, parent: object) -> None:
+        views = self._location_views(parent) or [parent]
+        states = []
+
+        for view in views:
+            with view.metrics.span("prepare"):
+                save_to, request = self._prepare_request(view)
+
+            states.append(_Pagination(view, save_to, request, self.first_page))
+
+        executor = _get_page_executor()
+
+        # the locations are paginated side by side, a round requests the next pages of all of them
+        while rounds := [(state, pages) for state in states if not state.done and (pages := state.next_pages(self))]:
+            # every page runs in a copy of the current context, so its spans nest under this action
+            futures = [
+                [
+                    executor.submit(contextvars.copy_context().run, self._fetch_page, state.parent, state.request, number)
+                    for number in pages
+                ]
+                for state, pages in rounds
+            ]
+
+            for (state, pages), page_futures in zip(rounds, futures):
+                state.merge(self, [future.result() for future in page_futures], pages)
+
+        self._save_pages(parent, states)
+
+    async def run_async(self, parent: object) -> None:
+        import asyncio
+
+        views = self._location_views(parent) or [parent]
+        states = []
+
+        for view in views:
+            with view.metrics.span("prepare"):
+                save_to, request = self._prepare_request(view)
+
+            states.append(_Pagination(view, save_to, request, self.first_page))
+
+        async def paginate(state: _Pagination) -> None:
+            while not state.done and (pages := state.next_pages(self)):
+                results = await asyncio.gather(*[self._fetch_page_async(state.parent, state.request, number) for number in pages])
+                state.merge(self, list(results), pages)
+
+        await asyncio.gather(*[paginate(state) for state in states])
+
+        self._save_pages(parent, states)
+
+    def _save_pages(self, parent: object, states: list) -> None:
+        if len(states) == 1:
+            parent.set(states[0].save_to, states[0].merged)
+        else:
+            parent.set(states[0].save_to, merge_location_responses([state.merged for state in states]))
+
+
+class _Pagination:
+    """Progress of paginating a single location."""
+
+    parent: object = None
+    save_to: str = None
+    request: dict = None
+    page: int = None
+    merged: list = None
+    total: int | None = None
+    done: bool = False
+
+    def __init__(self, parent: object, save_to: str, request: dict, page: int) -> None:
+        self.parent = parent
+        self.save_to = save_to
+        self.request = request
+        self.page = page
+        self.merged = []
+
+    def next_pages(self, action: PaginateAction) -> range:
+        return action._next_pages(self.page, self.merged, self.total)
+
+    def merge(self, action: PaginateAction, pages: list, numbers: range) -> None:
+        self.done, self.total = action._merge(pages, self.merged, self.total)
+        self.page = numbers.stop
 
 
 class ChainUpdateAction(Action):
+    """Updates an attribute by a sequence of computed expressions, each reading the previous value.
+
+    Modules fuse the updates into a single `pipeline` expression when possible
+    (see `trackr.core.analysis.fuse_expressions`), which is evaluated once and
+    doesn't store the intermediate values.
+    """
+
+    pipeline: DynamicConstructor = None
+
+    def fuse(self, lazy: bool = False) -> bool:
+        """Fuse the updates into `pipeline`, `lazy` if the result is only iterated once afterwards."""
+
+        from .analysis import fuse_expressions
+
+        attribute = self.args.get("attribute", "")
+        updates = self.args.get("updates", [])
+        variable_name = attribute[1:] if attribute.startswith("$") else attribute
+
+        # updates returning None on errors can't be fused, the next one would see the None
+        if (
+            len(updates) < 2
+            or not variable_name.isidentifier()
+            or not all(isinstance(update, DynamicConstructor) and update.type == "computed" and update.safe for update in updates)
+        ):
+            return False
+
+        value = fuse_expressions([update.value for update in updates], variable_name, lazy)
+
+        if value is None:
+            return False
+
+        def merge(key: str) -> str:
+            names = {}
+
+            for update in updates:
+                value = update.parameters.get(key, "")
+                names.update(dict.fromkeys(name for name in (value.split(",") if isinstance(value, str) else value) if name))
+
+            return ",".join(names)
+
+        self.pipeline = DynamicConstructor("computed", value, {
+            "type": "computed",
+            "value": value,
+            "dependencies": merge("dependencies"),
+            "import": merge("import"),
+        })
+        self.pipeline.kind = updates[-1].kind
+        self.pipeline.code = compile(value, f"<pipeline: {attribute}>", "eval")
+
+        return True
+
+    @property
+    def inputs(self) -> set[str]:
+        return super().inputs | self.outputs
+
+    @property
+    def outputs(self) -> set[str]:
+        return {self.args["attribute"]} if "attribute" in self.args else set()
+
     def __call__(self, parent: object) -> None:
         attribute = self.args.get("attribute")
         updates: list[DynamicConstructor] = self.args.get("updates", [])
@@ -91,14 +472,17 @@ class ChainUpdateAction(Action):
         if not hasattr(parent, "attributes") or not isinstance(parent.attributes, dict):
             raise ValueError("parent must have attributes dict")
 
+        variable_name = attribute[1:] if attribute.startswith("$") else attribute
+
+        if self.pipeline is not None:
+            with parent.metrics.span("eval", fused=len(updates)):
+                parent.set(attribute, self.pipeline(parent, **{variable_name: parent.attributes.get(attribute)}))
+
+            return
+
         for update in updates:
             if not isinstance(update, DynamicConstructor):
                 raise ValueError("Updates must be DynamicConstructors.")
 
-            update.parameters["dependencies"] = (
-                [attribute]
-                if "dependencies" not in update.parameters
-                else update.parameters["dependencies"] + [attribute]
-            )
-
-            set_by_dot_path(parent.attributes, attribute, update(parent))
+            with parent.metrics.span("eval"):
+                parent.set(attribute, update(parent, **{variable_name: parent.attributes.get(attribute)}))
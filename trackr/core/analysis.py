@@ -0,0 +1,374 @@
+import ast, builtins
+from typing import Iterable
+
+from .constructors import KIND_ITEM, KIND_SEARCH, KIND_CONSTANT
+
+
+DYNAMIC_NAME = "__"
+
+# builtins without side effects, expressions calling only these can be folded
+PURE_BUILTINS = frozenset({
+    "abs", "all", "any", "bool", "chr", "dict", "divmod", "enumerate", "filter", "float", "format", "frozenset",
+    "hex", "int", "len", "list", "map", "max", "min", "oct", "ord", "pow", "range", "repr", "reversed", "round",
+    "set", "slice", "sorted", "str", "sum", "tuple", "zip",
+})
+
+# modules imported without an `import` parameter, any other module has to be declared
+AUTO_IMPORTS = frozenset({
+    "base64", "collections", "datetime", "decimal", "functools", "hashlib", "itertools", "json", "math", "operator",
+    "random", "re", "string", "time", "urllib", "uuid",
+})
+
+
+class _NameCollector(ast.NodeVisitor):
+    """Collects the free names of an expression, respecting comprehension and lambda scopes."""
+
+    def __init__(self) -> None:
+        self.free: list[str] = []
+        self._scopes: list[set[str]] = [set()]
+
+    def _is_bound(self, name: str) -> bool:
+        return any(name in scope for scope in self._scopes)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if not isinstance(node.ctx, ast.Load):
+            self._scopes[-1].add(node.id)
+        elif not self._is_bound(node.id) and node.id not in self.free:
+            self.free.append(node.id)
+
+    def visit_NamedExpr(self, node: ast.NamedExpr) -> None:
+        # assignment expressions bind in the enclosing scope, even inside comprehensions
+        self.visit(node.value)
+        self._scopes[0].add(node.target.id)
+
+    def _visit_comprehension(self, node: ast.AST, elements: list[ast.AST]) -> None:
+        generators = node.generators
+
+        # the first iterable is evaluated in the enclosing scope
+        self.visit(generators[0].iter)
+        self._scopes.append(set())
+
+        for index, generator in enumerate(generators):
+            if index:
+                self.visit(generator.iter)
+
+            self.visit(generator.target)
+
+            for condition in generator.ifs:
+                self.visit(condition)
+
+        for element in elements:
+            self.visit(element)
+
+        self._scopes.pop()
+
+    def visit_ListComp(self, node: ast.ListComp) -> None:
+        self._visit_comprehension(node, [node.elt])
+
+    def visit_SetComp(self, node: ast.SetComp) -> None:
+        self._visit_comprehension(node, [node.elt])
+
+    def visit_GeneratorExp(self, node: ast.GeneratorExp) -> None:
+        self._visit_comprehension(node, [node.elt])
+
+    def visit_DictComp(self, node: ast.DictComp) -> None:
+        self._visit_comprehension(node, [node.key, node.value])
+
+    def visit_Lambda(self, node: ast.Lambda) -> None:
+        arguments = node.args
+
+        for default in [*arguments.defaults, *arguments.kw_defaults]:
+            if default is not None:
+                self.visit(default)
+
+        parameters = [*arguments.posonlyargs, *arguments.args, *arguments.kwonlyargs, arguments.vararg, arguments.kwarg]
+
+        self._scopes.append({parameter.arg for parameter in parameters if parameter is not None})
+        self.visit(node.body)
+        self._scopes.pop()
+
+
+def free_names(expression: str) -> list[str]:
+    """Names an expression reads from its namespace, in order of appearance.
+
+    Example:
+        >>> free_names("[value.get(key) for value in response]")
+        ['response', 'key']
+    """
+
+    collector = _NameCollector()
+    collector.visit(ast.parse(expression, mode="eval"))
+
+    return collector.free
+
+
+class ExpressionInfo:
+    """Result of `analyze_expression`."""
+
+    kind: str = None
+    names: list[str] = None
+    dependencies: list[str] = None
+    imports: list[str] = None
+
+    def __init__(self, kind: str, names: list[str], dependencies: list[str], imports: list[str]) -> None:
+        self.kind = kind
+        self.names = names
+        self.dependencies = dependencies
+        self.imports = imports
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.kind}, dependencies={self.dependencies}, imports={self.imports}>"
+
+
+def analyze_expression(
+    expression: str,
+    attributes: Iterable[str],
+    variables: Iterable[str] = (),
+    dependencies: Iterable[str] = (),
+    imports: Iterable[str] = (),
+) -> ExpressionInfo:
+    """Resolve the free names of a computed expression and classify it.
+
+    Every free name has to be a per-item variable, a builtin, `__`, an
+    attribute (`location` is the `$location` attribute) or a module of
+    `AUTO_IMPORTS`, otherwise the expression is rejected. Other modules have
+    to be declared in `imports`. Expressions reading a variable are
+    per-item, expressions reading attributes or modules or calling impure
+    builtins are per-search and all others are constant.
+
+    Args:
+        expression (str): The expression source.
+        attributes (Iterable[str]): Names of the attributes available to searches.
+        variables (Iterable[str]): Names assigned for every evaluation.
+        dependencies (Iterable[str]): Explicitly declared dependencies.
+        imports (Iterable[str]): Explicitly declared imports.
+
+    Returns:
+        ExpressionInfo: The resolved dependencies and imports and the kind.
+
+    Raises:
+        ValueError: The expression is invalid or reads an undefined name.
+    """
+
+    attributes, variables = set(attributes), set(variables)
+    dependencies, imports = list(dependencies), list(imports)
+
+    for dependency in dependencies:
+        if dependency not in attributes:
+            raise ValueError(f"unknown dependency {dependency!r} in expression: {expression}")
+
+    try:
+        names = free_names(expression)
+    except SyntaxError as e:
+        raise ValueError(f"invalid expression: {expression} ({e.msg})")
+
+    declared = {dependency[1:] if dependency.startswith("$") else dependency for dependency in dependencies}
+    kind = KIND_CONSTANT
+
+    for name in names:
+        if name in variables:
+            kind = KIND_ITEM
+            continue
+
+        # resolved in the order of the evaluation namespace, declared names shadow builtins
+        if name in declared or name in imports:
+            pass
+        elif name == DYNAMIC_NAME:
+            continue
+        elif hasattr(builtins, name):
+            if name in PURE_BUILTINS:
+                continue
+        elif name in attributes:
+            dependencies.append(name)
+        elif f"${name}" in attributes:
+            dependencies.append(f"${name}")
+        elif name in AUTO_IMPORTS:
+            imports.append(name)
+        else:
+            raise ValueError(f"undefined name {name!r} in expression: {expression}")
+
+        if kind == KIND_CONSTANT:
+            kind = KIND_SEARCH
+
+    return ExpressionInfo(kind, names, dependencies, imports)
+
+
+# calls consuming an iterable argument exactly once, `__.array_flatten` only materializes its result
+ITERATING_CALLS = {
+    "all": 0, "any": 0, "dict": 0, "enumerate": 0, "frozenset": 0, "list": 0, "max": 0, "min": 0, "set": 0,
+    "sorted": 0, "sum": 0, "tuple": 0, "map": 1, "filter": 1,
+    f"{DYNAMIC_NAME}.array_flatten": 0, f"{DYNAMIC_NAME}.flatten": 0,
+}
+
+
+def _call_name(node: ast.Call) -> str | None:
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+
+    if isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name):
+        return f"{node.func.value.id}.{node.func.attr}"
+
+    return None
+
+
+def _lazy(node: ast.AST) -> ast.AST:
+    """The lazy equivalent of an expression whose result is only iterated once."""
+
+    if isinstance(node, ast.ListComp):
+        return ast.GeneratorExp(elt=node.elt, generators=node.generators)
+
+    if isinstance(node, ast.Call) and _call_name(node) == f"{DYNAMIC_NAME}.array_flatten" and len(node.args) == 1:
+        return ast.Call(
+            func=ast.Attribute(value=ast.Name(id=DYNAMIC_NAME, ctx=ast.Load()), attr="flatten", ctx=ast.Load()),
+            args=node.args,
+            keywords=[],
+        )
+
+    return node
+
+
+class _Lazifier(ast.NodeTransformer):
+    """Rewrites list comprehensions and `__.array_flatten` consumed by an iteration into lazy equivalents."""
+
+    def _visit_comprehension(self, node: ast.AST) -> ast.AST:
+        self.generic_visit(node)
+
+        for generator in node.generators:
+            generator.iter = _lazy(generator.iter)
+
+        return node
+
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = _visit_comprehension
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        self.generic_visit(node)
+
+        name = _call_name(node)
+        index = ITERATING_CALLS.get(name, None)
+
+        # max and min compare their arguments when given several
+        if name in ("max", "min") and len(node.args) != 1:
+            index = None
+
+        if index is not None and len(node.args) > index and not node.keywords:
+            node.args[index] = _lazy(node.args[index])
+
+        return node
+
+
+class _Substitution(ast.NodeTransformer):
+    # replaces the free uses of a name that are evaluated once, other uses make the substitution fail
+
+    def __init__(self, name: str, replacement: ast.AST) -> None:
+        self.name = name
+        self.replacement = replacement
+        self.count = 0
+        self.failed = False
+        self._deferred = 0
+        self._bound: list[set[str]] = []
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id != self.name or not isinstance(node.ctx, ast.Load) or any(self.name in s for s in self._bound):
+            return node
+
+        if self._deferred:
+            self.failed = True
+            return node
+
+        self.count += 1
+        return self.replacement
+
+    def _visit_scope(self, nodes: list[ast.AST], bound: set[str]) -> None:
+        self._deferred += 1
+        self._bound.append(bound)
+
+        for node in nodes:
+            self.visit(node)
+
+        self._bound.pop()
+        self._deferred -= 1
+
+    def _visit_comprehension(self, node: ast.AST) -> ast.AST:
+        # the first iterable is evaluated once, everything else once per item
+        first = node.generators[0]
+        first.iter = self.visit(first.iter)
+
+        bound = {target.id for generator in node.generators for target in ast.walk(generator.target)
+                 if isinstance(target, ast.Name)}
+
+        self._deferred += 1
+        self._bound.append(bound)
+
+        for index, generator in enumerate(node.generators):
+            if index:
+                generator.iter = self.visit(generator.iter)
+
+            generator.ifs = [self.visit(condition) for condition in generator.ifs]
+
+        if isinstance(node, ast.DictComp):
+            node.key, node.value = self.visit(node.key), self.visit(node.value)
+        else:
+            node.elt = self.visit(node.elt)
+
+        self._bound.pop()
+        self._deferred -= 1
+
+        return node
+
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = _visit_comprehension
+
+    def visit_Lambda(self, node: ast.Lambda) -> ast.AST:
+        arguments = node.args
+        arguments.defaults = [self.visit(default) for default in arguments.defaults]
+
+        parameters = [*arguments.posonlyargs, *arguments.args, *arguments.kwonlyargs, arguments.vararg, arguments.kwarg]
+
+        self._deferred += 1
+        self._bound.append({parameter.arg for parameter in parameters if parameter is not None})
+        node.body = self.visit(node.body)
+        self._bound.pop()
+        self._deferred -= 1
+
+        return node
+
+
+def fuse_expressions(expressions: list[str], variable: str, lazy: bool = False) -> str | None:
+    """Fuse consecutive updates of a variable into a single expression.
+
+    Each expression reads the result of the previous one as `variable`, it is
+    substituted into the next expression if that reads it exactly once and
+    not per item of a comprehension or in a lambda, where it would be
+    evaluated repeatedly. List comprehensions and `__.array_flatten` that are
+    only iterated become generators. With `lazy` the result itself is only
+    iterated, so it is made lazy as well.
+
+    Example:
+        >>> fuse_expressions(["response.values()", "[v['items'] for v in response]", "__.array_flatten(response)"], "response")
+        "__.array_flatten((v['items'] for v in response.values()))"
+
+    Returns:
+        str | None: The fused expression, None if the updates cannot be fused.
+    """
+
+    try:
+        tree = ast.parse(expressions[0], mode="eval").body
+
+        for expression in expressions[1:]:
+            node = ast.parse(expression, mode="eval").body
+
+            substitution = _Substitution(variable, tree)
+            node = substitution.visit(node)
+
+            if substitution.failed or substitution.count != 1:
+                return None
+
+            tree = node
+    except SyntaxError:
+        return None
+
+    tree = _Lazifier().visit(tree)
+
+    if lazy:
+        tree = _lazy(tree)
+
+    return ast.unparse(ast.fix_missing_locations(ast.Expression(body=tree)))
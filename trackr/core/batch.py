@@ -0,0 +1,221 @@
+import json, logging, os, time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, Callable, Iterable, Iterator
+
+from .module import SearchModule
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CONCURRENCY = 8
+
+
+class BatchJob:
+    module_id: str = None
+    query: str = None
+    location: Any = None
+
+    def __init__(self, module_id: str, query: str, location: Any) -> None:
+        self.module_id = module_id
+        self.query = query
+        self.location = location
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.module_id}: {self.query!r} @ {self.location!r}>"
+
+    @property
+    def key(self) -> str:
+        return json.dumps([self.module_id, self.query, self.location], ensure_ascii=False)
+
+
+class BatchStats:
+    total: int = 0
+    skipped: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    results: int = 0
+    elapsed: float = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}<{self.succeeded} ok, {self.failed} failed, "
+            f"{self.skipped} skipped, {self.results} results>"
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "skipped": self.skipped,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "results": self.results,
+            "elapsed": self.elapsed,
+        }
+
+
+def read_jobs(file_path: str) -> Iterator[BatchJob]:
+    """Read jobs from a JSONL file, one `{"module": ..., "query": ..., "location": ...}` per line."""
+
+    with open(file_path, "r", encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+
+            try:
+                job = json.loads(line)
+                yield BatchJob(job["module"], job["query"], job["location"])
+            except (ValueError, KeyError, TypeError):
+                raise ValueError(f"invalid job on line {number}: {file_path}")
+
+
+def expand_jobs(module: SearchModule, queries: Iterable[str]) -> Iterator[BatchJob]:
+    """Jobs for every query at every store of a module's location data, modules
+    without location data are skipped."""
+
+    if module.location_data is None:
+        logger.warning("Module has no location data, skipping: %s", module.id)
+        return
+
+    locations = list(dict.fromkeys(value for _, _, value in module.location_data.locations()))
+
+    for query in queries:
+        for location in locations:
+            yield BatchJob(module.id, query, location)
+
+
+def _completed_jobs(file_path: str) -> set[str]:
+    # the output doubles as the checkpoint, a job is done once its record was written
+    done = set()
+
+    if not os.path.exists(file_path):
+        return done
+
+    with open(file_path, "rb+") as file:
+        data = file.read()
+
+        # a record cut off by an interruption is dropped and its job runs again
+        if data and not data.endswith(b"\n"):
+            file.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+
+    for line in data.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+
+        if record.get("ok", False):
+            done.add(BatchJob(record["module"], record["query"], record["location"]).key)
+
+    return done
+
+
+class BatchRunner:
+    """Runs many searches with bounded concurrency and streams the records to JSONL.
+
+    Each output line holds the job, whether it succeeded, its duration and
+    either the results or the error. With `compact` the results are written in
+    the columnar form of `ResultBatch.as_dict`, storing the query, location and
+    store once per record. When the output file already exists the jobs
+    recorded as successful in it are skipped, so an interrupted sweep is
+    resumed by running it again with the same output. Failed jobs are retried.
+    """
+
+    get_module: Callable[[str], SearchModule] = None
+    concurrency: int = None
+    compact: bool = False
+
+    def __init__(
+        self, get_module: Callable[[str], SearchModule], concurrency: int = DEFAULT_CONCURRENCY, compact: bool = False
+    ) -> None:
+        self.get_module = get_module
+        self.concurrency = max(1, concurrency)
+        self.compact = compact
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<concurrency={self.concurrency}>"
+
+    def _run_job(self, job: BatchJob) -> dict:
+        start = time.perf_counter()
+        record = {"module": job.module_id, "query": job.query, "location": job.location}
+
+        try:
+            if self.compact:
+                results = self.get_module(job.module_id).search_columnar(job.query, job.location).as_dict()
+            else:
+                results = self.get_module(job.module_id).search(job.query, job.location)
+        except (Exception, SystemExit) as e:
+            record.update(ok=False, elapsed=time.perf_counter() - start, error=f"{e.__class__.__name__}: {e}")
+        else:
+            record.update(ok=True, elapsed=time.perf_counter() - start, results=results)
+
+        return record
+
+    def run(self, jobs: Iterable[BatchJob], output_path: str, resume: bool = True) -> BatchStats:
+        """Run the jobs and append a record per job to `output_path`.
+
+        Args:
+            jobs (Iterable[BatchJob]): The jobs, consumed lazily.
+            output_path (str): The JSONL output, also used to resume.
+            resume (bool): Skip jobs already completed in `output_path`,
+                otherwise the file is overwritten.
+
+        Returns:
+            BatchStats: The counts of the run.
+        """
+
+        done = _completed_jobs(output_path) if resume else set()
+        stats = BatchStats()
+        start = time.perf_counter()
+
+        if done:
+            logger.info("Resuming batch, %d jobs already completed", len(done))
+
+        pending: set[Future] = set()
+
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="trackr-batch") as executor, \
+                open(output_path, "a" if resume else "w", encoding="utf-8") as output:
+
+            def write(futures: set[Future]) -> None:
+                for future in futures:
+                    record = future.result()
+
+                    output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+                    if record["ok"]:
+                        stats.succeeded += 1
+                        stats.results += record["results"]["length"] if self.compact else len(record["results"])
+                    else:
+                        stats.failed += 1
+                        logger.warning("Job failed: %s %r @ %r: %s", record["module"], record["query"],
+                                       record["location"], record["error"])
+
+                # records are only flushed in batches, a crash loses at most the unflushed ones
+                output.flush()
+
+                if (completed := stats.succeeded + stats.failed) // 100 > (completed - len(futures)) // 100:
+                    logger.info("Completed %d jobs (%d failed)", completed, stats.failed)
+
+            for job in jobs:
+                stats.total += 1
+
+                if job.key in done:
+                    stats.skipped += 1
+                    continue
+
+                # only a bounded number of jobs is in flight, so job files of any size stream through
+                if len(pending) >= self.concurrency * 2:
+                    completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    write(completed)
+
+                pending.add(executor.submit(self._run_job, job))
+
+            while pending:
+                completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(completed)
+
+        stats.elapsed = time.perf_counter() - start
+        logger.info("Batch finished: %s in %.1fs", stats, stats.elapsed)
+
+        return stats
@@ -0,0 +1,205 @@
+import json, logging, threading, time
+from collections import OrderedDict
+from pathlib import Path
+
+from .transport import Transport, TransportResponse
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL = 300.0
+
+
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate:.2f}>"
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+
+class ResponseCache:
+    """LRU cache of transport responses with a time to live.
+
+    When `path` is set, responses are also written to that directory so they
+    survive restarts and can be shared between processes.
+    """
+
+    max_size: int = None
+    ttl: float = None
+    path: Path = None
+    stats: CacheStats = None
+
+    def __init__(
+        self, max_size: int = DEFAULT_CACHE_SIZE, ttl: float = DEFAULT_CACHE_TTL, path: str = None
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self.stats = CacheStats()
+
+        self._entries: OrderedDict[str, tuple[float, TransportResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{len(self._entries)}/{self.max_size}, ttl={self.ttl}>"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _disk_get(self, key: str) -> tuple[float, TransportResponse] | None:
+        import pickle
+
+        file_path = self.path / f"{key}.cache"
+
+        try:
+            with open(file_path, "rb") as file:
+                expires, status_code, content, headers = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+
+        if expires < time.time():
+            file_path.unlink(missing_ok=True)
+            return None
+
+        return expires, TransportResponse(status_code, content, headers)
+
+    def _disk_set(self, key: str, expires: float, response: TransportResponse) -> None:
+        import pickle, tempfile
+
+        # the temporary name is unique across the threads and processes sharing the directory
+        with tempfile.NamedTemporaryFile(dir=self.path, prefix=f"{key}.", suffix=".tmp", delete=False) as file:
+            pickle.dump((expires, response.status_code, response.content, response.headers), file)
+
+        Path(file.name).replace(self.path / f"{key}.cache")
+
+    def get(self, key: str) -> TransportResponse | None:
+        with self._lock:
+            entry = self._entries.get(key, None)
+
+            if entry is not None and entry[0] < time.time():
+                del self._entries[key]
+                entry = None
+
+            if entry is None and self.path is not None:
+                entry = self._disk_get(key)
+
+                if entry is not None:
+                    self._store(key, entry)
+
+            if entry is None:
+                self.stats.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+
+            return entry[1]
+
+    def _store(self, key: str, entry: tuple[float, TransportResponse]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def set(self, key: str, response: TransportResponse, ttl: float = None) -> None:
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            self._store(key, (expires, response))
+
+        if self.path is not None:
+            self._disk_set(key, expires, response)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+        if self.path is not None:
+            for file_path in self.path.glob("*.cache"):
+                file_path.unlink(missing_ok=True)
+
+
+def make_cache_key(method: str, url: str, params: dict = None, volatile: set[str] = None) -> str:
+    """Build a cache key for a request. Volatile params, such as timestamps used
+    for cache busting, are left out so they don't make every request unique.
+
+    Args:
+        method (str): The request method.
+        url (str): The request URL.
+        params (dict): The query params.
+        volatile (set[str]): Names of params to ignore.
+
+    Returns:
+        str: The cache key.
+    """
+
+    import hashlib
+
+    volatile = volatile or set()
+    params = {key: value for key, value in (params or {}).items() if key not in volatile}
+    data = json.dumps([method, url, params], sort_keys=True, default=str, ensure_ascii=False)
+
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class CachingTransport(Transport):
+    """Transport wrapper serving successful responses from a `ResponseCache`."""
+
+    transport: Transport = None
+    cache: ResponseCache = None
+    volatile: set[str] = None
+
+    def __init__(self, transport: Transport, cache: ResponseCache, volatile: list[str] = None) -> None:
+        self.transport = transport
+        self.cache = cache
+        self.volatile = set(volatile or [])
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.transport}, {self.cache}>"
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        timeout: float = None,
+    ) -> TransportResponse:
+        key = make_cache_key(method, url, params, self.volatile)
+
+        if (response := self.cache.get(key)) is not None:
+            logger.debug("Cache hit: %s %s", method, url)
+            return response
+
+        response = self.transport.request(method, url, headers=headers, params=params, timeout=timeout)
+
+        if response.status_code == 200:
+            self.cache.set(key, response)
+
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
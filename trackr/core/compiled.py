@@ -0,0 +1,244 @@
+import json, marshal, mmap, os, struct, sys
+from functools import cached_property
+from pathlib import Path
+from types import CodeType
+
+from trackr import VERSION
+
+from .constructors import DynamicConstructor
+from .location import CompactLocationData
+
+
+MAGIC = b"TRKM"
+FORMAT_VERSION = 1
+
+SECTION_META = "meta"
+SECTION_MODULE = "module"
+SECTION_EXPRESSIONS = "expressions"
+SECTION_LOCATIONS = "locations"
+SECTION_LOCATION_INDEX = "location_index"
+
+
+def source_hash(file_paths: list[str]) -> bytes:
+    """Hash the source files of a module together with the format and trackr
+    versions, so upgrading either invalidates compiled modules.
+
+    Args:
+        file_paths (list[str]): The module YAML followed by its data files.
+
+    Returns:
+        bytes: The SHA-256 digest.
+    """
+
+    import hashlib
+
+    digest = hashlib.sha256(f"{FORMAT_VERSION}:{VERSION}".encode("utf-8"))
+
+    for file_path in file_paths:
+        with open(file_path, "rb") as file:
+            content = file.read()
+
+        digest.update(len(content).to_bytes(8, "little"))
+        digest.update(content)
+
+    return digest.digest()
+
+
+class ExpressionTable:
+    """Lazily unmarshalled code objects of a compiled module."""
+
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+
+    @cached_property
+    def _codes(self) -> list[CodeType] | None:
+        # marshal data is only valid for the interpreter version that wrote it,
+        # expressions are compiled from source again on a mismatch
+        if tuple(self._data[:2]) != sys.version_info[:2]:
+            return None
+
+        return marshal.loads(self._data[2:])
+
+    def __getitem__(self, expression_id: int) -> CodeType | None:
+        return self._codes[expression_id] if self._codes is not None else None
+
+
+class ModuleFile:
+    """Versioned compiled module file.
+
+    Layout, all integers little-endian:
+
+        header   magic, format version, trackr version, source hash, section count
+        table    (name, offset, length) per section
+        sections meta (JSON), module (pickle), expressions (marshal),
+                 locations (compact location data, optional),
+                 location_index (marshalled `LocationIndex`, optional)
+
+    Opening a file only reads the header. Every section is read on first
+    access, so e.g. the meta section can be inspected without unpickling the
+    module and location data is memory-mapped instead of decoded. The location
+    index is built at compile time and only read on the first lookup.
+    """
+
+    _HEADER = struct.Struct("<4sH3H32sH")
+    _SECTION = struct.Struct("<16sQQ")
+
+    file_path: str = None
+    format_version: int = None
+    trackr_version: tuple = None
+    source_hash: bytes = None
+    sections: dict[str, tuple[int, int]] = None
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = os.path.abspath(file_path)
+
+        with open(self.file_path, "rb") as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._buffer) < self._HEADER.size:
+            raise ValueError("invalid compiled module file")
+
+        magic, self.format_version, *trackr_version, self.source_hash, count = (
+            self._HEADER.unpack_from(self._buffer, 0)
+        )
+        self.trackr_version = tuple(trackr_version)
+
+        if magic != MAGIC:
+            raise ValueError("invalid compiled module file")
+
+        if self.format_version != FORMAT_VERSION:
+            raise ValueError(f"unsupported compiled module format: {self.format_version}")
+
+        self.sections = {}
+
+        for index in range(count):
+            name, offset, length = self._SECTION.unpack_from(
+                self._buffer, self._HEADER.size + index * self._SECTION.size
+            )
+            self.sections[name.rstrip(b"\0").decode("ascii")] = (offset, length)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.file_path}, v{'.'.join(map(str, self.trackr_version))}>"
+
+    def section(self, name: str) -> bytes:
+        offset, length = self.sections[name]
+
+        return self._buffer[offset:offset + length]
+
+    @cached_property
+    def meta(self) -> dict:
+        """The `meta` and `trackr` sections of the module and its source files."""
+
+        return json.loads(self.section(SECTION_META))
+
+    @cached_property
+    def expressions(self) -> ExpressionTable:
+        return ExpressionTable(self.section(SECTION_EXPRESSIONS))
+
+    def load(self) -> object:
+        import pickle
+
+        module = pickle.loads(self.section(SECTION_MODULE))
+
+        for constructor in module.iter_constructors():
+            if isinstance(constructor, DynamicConstructor) and (
+                constructor.expression_id is not None or constructor.function_id is not None
+            ):
+                constructor.expressions = self.expressions
+
+        if SECTION_LOCATIONS in self.sections:
+            offset, length = self.sections[SECTION_LOCATIONS]
+            index_offset, index_length = self.sections.get(SECTION_LOCATION_INDEX, (0, 0))
+            module.location_data = CompactLocationData.from_file(
+                self.file_path, offset, length, index_offset, index_length
+            )
+
+        return module
+
+    @property
+    def source_paths(self) -> list[str]:
+        """The source files recorded in the meta section, the module YAML first."""
+
+        directory = Path(self.file_path).parent
+
+        return [str(directory / source) for source in self.meta.get("sources", [])]
+
+    def is_up_to_date(self) -> bool:
+        """Check the source files recorded in the meta section against the source hash."""
+
+        sources = self.source_paths
+
+        try:
+            return bool(sources) and source_hash(sources) == self.source_hash
+        except OSError:
+            return False
+
+    @staticmethod
+    def is_compiled(file_path: str) -> bool:
+        with open(file_path, "rb") as file:
+            return file.read(len(MAGIC)) == MAGIC
+
+    @classmethod
+    def write(cls, module: object, file_path: str, sources: list[str]) -> None:
+        """Write a module prepared for compilation.
+
+        Args:
+            module (SearchModule): The module, loaded with `is_compilation=True`.
+            file_path (str): The output path.
+            sources (list[str]): The source files, used for the source hash.
+        """
+
+        import pickle
+
+        directory = Path(file_path).parent
+        codes = []
+
+        for constructor in module.iter_constructors():
+            if not isinstance(constructor, DynamicConstructor):
+                continue
+
+            if constructor.code is not None:
+                constructor.expression_id = len(codes)
+                codes.append(constructor.code)
+
+            # per-item functions of the result mapping, compiled by `_prepare_compilation`
+            if constructor.function_code is not None:
+                constructor.function_id = len(codes)
+                codes.append(constructor.function_code)
+
+        location_data = module.location_data
+        module.location_data = None
+
+        try:
+            sections = {
+                SECTION_META: json.dumps({
+                    "meta": module._meta_section,
+                    "trackr": module._trackr_section,
+                    "sources": [Path(os.path.relpath(source, directory)).as_posix() for source in sources],
+                }, ensure_ascii=False, default=str).encode("utf-8"),
+                SECTION_MODULE: pickle.dumps(module, protocol=pickle.HIGHEST_PROTOCOL),
+                SECTION_EXPRESSIONS: bytes(sys.version_info[:2]) + marshal.dumps(codes),
+            }
+        finally:
+            module.location_data = location_data
+
+        if location_data is not None:
+            sections[SECTION_LOCATIONS] = CompactLocationData.encode(location_data._data)
+            sections[SECTION_LOCATION_INDEX] = location_data.index.dumps()
+
+        offset = cls._HEADER.size + len(sections) * cls._SECTION.size
+        table = []
+
+        for name, data in sections.items():
+            table.append(cls._SECTION.pack(name.encode("ascii"), offset, len(data)))
+            offset += len(data)
+
+        header = cls._HEADER.pack(MAGIC, FORMAT_VERSION, *VERSION, source_hash(sources), len(sections))
+        temp_path = f"{file_path}.tmp"
+
+        with open(temp_path, "wb") as file:
+            file.write(header)
+            file.write(b"".join(table))
+            file.write(b"".join(sections.values()))
+
+        Path(temp_path).replace(file_path)
@@ -1,9 +1,17 @@
 from abc import abstractmethod, ABC
-import re, importlib
-from typing import Callable
+import re, importlib, marshal, sys
+from types import CodeType
+from typing import Any, Callable, Iterator
 
 
-from .utility import get_by_dot_path, dynamic
+from .utility import DotPath, dynamic
+
+
+# kinds of computed expressions, evaluated once per result item, once per
+# search or only once when the module is loaded, see `trackr.core.analysis`
+KIND_ITEM = "item"
+KIND_SEARCH = "search"
+KIND_CONSTANT = "constant"
 
 
 class Constructor(ABC):
@@ -38,6 +46,23 @@ class Constructor(ABC):
 
 class DynamicConstructor(Constructor):
     parameters: dict = None
+    code: CodeType = None
+    path: DotPath = None
+
+    # set by `analyze`, the value of constant expressions is folded when the module is loaded
+    kind: str = None
+    folded: bool = False
+    constant: Any = None
+
+    # set for modules loaded from the compiled format, where code objects are
+    # stored in a separate section and only unmarshalled when first needed
+    expression_id: int = None
+    expressions = None
+
+    # code of the expression as a function of a per-item variable, see `compile_function`
+    function_code: CodeType = None
+    function_variable: str = None
+    function_id: int = None
 
     def __init__(self, type: str, value: str, parameters: dict) -> None:
         super().__init__(type, value, parameters)
@@ -45,21 +70,133 @@ class DynamicConstructor(Constructor):
         self.safe = self.parameters.get("safe", "true").lower() == "true"
         self.prepared = False
 
-    def __call__(self, parent: object, *args, **kwargs):
+        if self.type == "attribute":
+            self.path = DotPath(self.value)
+
+    def __call__(self, parent: object, *args, **variables):
+        if self.folded:
+            return self.constant
+
         if self.type == "attribute":
             return self._get_attribute(parent)
         elif self.type == "computed":
-            return self._get_computed(parent)
+            return self._get_computed(parent, variables)
         else:
             raise ValueError(f"invalid type parameter: {self.type}")
 
+    def __getstate__(self) -> dict:
+        # imported modules cannot be pickled, they are resolved again on first use
+        state = self.__dict__.copy()
+        state.pop("imports", None)
+        state.pop("expressions", None)
+        state["prepared"] = False
+
+        # code objects are stored as marshal data, which is only valid for the
+        # interpreter version that produced it
+        for key, expression_id in (("code", self.expression_id), ("function_code", self.function_id)):
+            if expression_id is not None:
+                state.pop(key, None)
+            elif state.get(key, None) is not None:
+                state[key] = (sys.version_info[:2], marshal.dumps(state[key]))
+
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        codes = {key: state.pop(key, None) for key in ("code", "function_code")}
+
+        self.__dict__.update(state)
+
+        for key, code in codes.items():
+            if code is not None and code[0] == sys.version_info[:2]:
+                setattr(self, key, marshal.loads(code[1]))
+
+        # modules pickled before paths were compiled
+        if self.type == "attribute" and self.path is None:
+            self.path = DotPath(self.value)
+
+    @property
+    def references(self) -> set[str]:
+        """Top level attribute names this constructor reads."""
+
+        if self.type == "attribute":
+            return {self.value.split(".")[0]}
+
+        deps = self.parameters.get("dependencies", [])
+
+        return {d for d in (deps.split(",") if isinstance(deps, str) else deps) if d}
+
+    def analyze(self, attributes: set[str], variables: set[str] = frozenset()) -> None:
+        """Infer the dependencies and imports of a computed expression and classify it.
+
+        Inferred names are added to the `dependencies` and `import` parameters,
+        constant expressions with an immutable value are folded.
+
+        Raises:
+            ValueError: The expression reads an undefined name.
+        """
+
+        if self.type != "computed":
+            return
+
+        from .analysis import analyze_expression
+
+        deps = self.parameters.get("dependencies", [])
+
+        info = analyze_expression(
+            self.value,
+            attributes,
+            variables,
+            dependencies=[d for d in (deps.split(",") if isinstance(deps, str) else deps) if d],
+            imports=[i for i in self.parameters.get("import", "").split(",") if i],
+        )
+
+        self.parameters["dependencies"] = ",".join(info.dependencies)
+        self.parameters["import"] = ",".join(info.imports)
+        self.kind = info.kind
+
+        if self.kind == KIND_CONSTANT:
+            self._fold()
+
+    def _fold(self) -> None:
+        try:
+            value = eval(compile(self.value, f"<dynamic: {self.value}>", "eval"), {"__": dynamic})
+        except Exception as e:
+            if self.safe:
+                raise ValueError(f"constant expression failed: {self.value} ({e.__class__.__name__}: {e})")
+
+            value = None
+
+        # mutable values are shared by every search, so only immutable ones are folded
+        if _is_immutable(value):
+            self.folded = True
+            self.constant = value
+
     def _get_attribute(self, parent: object):
-        return get_by_dot_path(getattr(parent, "attributes", {}), self.value)
+        return self.path.get(getattr(parent, "attributes", {}))
 
-    def _prepare_computed(self, parent: object):
+    def _prepare_computed(self):
         if self.prepared:
             return
 
+        if self.code is None and self.expressions is not None:
+            self.code = self.expressions[self.expression_id]
+
+        if self.code is None:
+            self.code = compile(self.value, f"<dynamic: {self.value}>", "eval")
+
+        self.imports = {
+            import_: importlib.import_module(import_)
+            for import_ in [
+                i for i in self.parameters.get("import", "").split(",") if i
+            ]
+        }
+
+        # add dynamic utility functions to imports
+        self.imports["__"] = dynamic
+
+        self.prepared = True
+
+    def _get_dependencies(self, parent: object) -> dict:
         parent_attributes: dict = getattr(parent, "attributes", {})
 
         deps = self.parameters.get("dependencies", [])
@@ -69,7 +206,7 @@ class DynamicConstructor(Constructor):
         elif not isinstance(deps, list):
             raise ValueError("invalid dependencies parameter")
 
-        self.dependencies = {
+        return {
             (
                 dependency[1:] if dependency.startswith("$") else dependency
             ): parent_attributes[dependency]
@@ -77,18 +214,6 @@ class DynamicConstructor(Constructor):
             if dependency in parent_attributes
         }
 
-        self.imports = {
-            import_: importlib.import_module(import_)
-            for import_ in [
-                i for i in self.parameters.get("import", "").split(",") if i
-            ]
-        }
-
-        # add dynamic utility functions to imports
-        self.imports["__"] = dynamic
-
-        self.prepared = True
-
     def _safe_execute(self, func: Callable, *args, **kwargs):
         if self.safe:
             return func(*args, **kwargs)
@@ -98,15 +223,103 @@ class DynamicConstructor(Constructor):
         except Exception:
             return None
 
-    def _get_computed(self, parent: object):
+    def _get_computed(self, parent: object, variables: dict):
+        if (metrics := getattr(parent, "metrics", None)) is not None:
+            metrics.count("eval_calls")
+
+        namespace = self.namespace(parent)
+        namespace.update(variables)
+
+        return self.evaluate(namespace)
+
+    def namespace(self, parent: object) -> dict:
+        """Build the evaluation namespace of a computed constructor for `parent`.
+
+        The namespace can be reused for every evaluation within the same search,
+        only the per-item variables have to be assigned before each `evaluate` call.
+        """
+
         if not self.prepared:
             self.prepare(parent)
 
-        return self._safe_execute(eval, self.value, {**self.imports, **self.dependencies})
+        return {**self.imports, **self._get_dependencies(parent)}
 
-    def prepare(self, parent: object):
+    def compile_function(self, variable_name: str) -> CodeType:
+        """Code of a lambda of `variable_name` returning the expression.
+
+        Evaluated in a `namespace` it gives a function called once per item,
+        which the result mapper uses for computed fields. The code is compiled
+        once, modules loaded from the compiled format use the stored code.
+        """
+
+        if self.function_code is None and self.function_id is not None and self.expressions is not None:
+            self.function_code = self.expressions[self.function_id]
+
+        if self.function_code is None or self.function_variable != variable_name:
+            self.function_code = compile(f"lambda {variable_name}: ({self.value})", f"<dynamic: {self.value}>", "eval")
+            self.function_variable = variable_name
+            self.function_id = None
+
+        return self.function_code
+
+    def evaluate(self, namespace: dict):
+        """Evaluate the precompiled expression in a namespace from `namespace`."""
+
+        return self._safe_execute(eval, self.code, namespace)
+
+    def prepare(self, parent: object = None):
         if self.type == "computed":
-            self._prepare_computed(parent)
+            self._prepare_computed()
+
+
+def _is_immutable(value: Any) -> bool:
+    if isinstance(value, (tuple, frozenset)):
+        return all(_is_immutable(item) for item in value)
+
+    return value is None or isinstance(value, (bool, int, float, complex, str, bytes))
+
+
+def iter_constructors(root: Any) -> Iterator[Constructor]:
+    """Yield every constructor in a nested structure of dicts and lists."""
+
+    if isinstance(root, Constructor):
+        yield root
+    elif isinstance(root, list):
+        for item in root:
+            yield from iter_constructors(item)
+    elif isinstance(root, dict):
+        for value in root.values():
+            yield from iter_constructors(value)
+
+
+def collect_references(root: Any) -> set[str]:
+    """Collect the attribute names referenced by all dynamic constructors in `root`."""
+
+    if isinstance(root, DynamicConstructor):
+        return root.references
+    elif isinstance(root, list):
+        return set().union(*[collect_references(item) for item in root])
+    elif isinstance(root, dict):
+        return set().union(*[collect_references(value) for value in root.values()])
+
+    return set()
+
+
+def resolve_dynamic_attributes(parent: object, root: Any) -> Any:
+    """Return a copy of `root` with every constructor replaced by its value.
+
+    Unlike `compute_dynamic_attributes` the original structure is left untouched,
+    so it can be shared between concurrent searches.
+    """
+
+    if isinstance(root, Constructor):
+        return root(parent)
+    elif isinstance(root, list):
+        return [resolve_dynamic_attributes(parent, item) for item in root]
+    elif isinstance(root, dict):
+        return {key: resolve_dynamic_attributes(parent, value) for key, value in root.items()}
+
+    return root
 
 
 def compute_dynamic_attributes(
@@ -114,7 +327,10 @@ def compute_dynamic_attributes(
 ) -> None:
     if isinstance(root, list):
         for item in root:
-            compute_dynamic_attributes(parent, item, prepare)
+            if isinstance(item, Constructor) and prepare:
+                item.prepare(parent)
+            else:
+                compute_dynamic_attributes(parent, item, prepare)
     elif isinstance(root, dict):
         for key, value in root.items():
             if isinstance(value, Constructor):
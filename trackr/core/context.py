@@ -0,0 +1,68 @@
+from typing import Any
+
+from .metrics import SearchMetrics
+from .transport import Transport
+from .utility import replace_by_dot_path
+
+
+# attributes every search context adds to the module attributes
+SEARCH_ATTRIBUTES = frozenset({"$query", "$location", "$locations"})
+
+
+class SearchContext:
+    """Mutable state of a single search.
+
+    The compiled `SearchModule` is a read-only template shared by every search,
+    all values produced while executing actions are stored here instead.
+    """
+
+    module: object = None
+    attributes: dict = None
+    metrics: SearchMetrics = None
+    _transport: Transport = None
+
+    def __init__(self, module: object, query: str, location: Any, locations: list = None) -> None:
+        # `$locations` holds every location searched at once, `$location` the one currently mapped
+        self.module = module
+        self.attributes = {
+            **module.attributes,
+            "$query": query,
+            "$location": location,
+            "$locations": list(locations) if locations is not None else [location],
+        }
+        self.metrics = SearchMetrics(getattr(module, "id", None), query, location if locations is None else list(locations))
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.attributes['$query']}, {self.attributes['$location']}>"
+
+    def at_location(self, location: Any) -> "SearchContext":
+        """A view of this search with `$location` set to `location`.
+
+        The view shares the metrics and the transport, attributes it sets
+        are not visible in this context.
+        """
+
+        import copy
+
+        context = copy.copy(self)
+        context.attributes = {**self.attributes, "$location": location}
+
+        return context
+
+    def set(self, path: str, value: Any) -> None:
+        """Set an attribute by a dot path without touching the module attributes."""
+
+        key = path.partition(".")[0]
+
+        if key == path:
+            self.attributes[key] = value
+        else:
+            self.attributes[key] = replace_by_dot_path(self.attributes, path, value)[key]
+
+    @property
+    def transport(self) -> Transport:
+        return self._transport or self.module.transport
+
+    @transport.setter
+    def transport(self, transport: Transport) -> None:
+        self._transport = transport
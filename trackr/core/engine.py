@@ -0,0 +1,351 @@
+import logging, queue, threading, time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+from trackr import MODULE_FILE_EXTENSION
+
+from .module import SearchModule
+from .registry import ModuleRegistry
+
+
+class SearchResult:
+    module_id: str = None
+    results: list[dict] = None
+    error: BaseException = None
+    elapsed: float = None
+
+    def __init__(
+        self,
+        module_id: str,
+        results: list[dict] = None,
+        error: BaseException = None,
+        elapsed: float = None,
+    ) -> None:
+        self.module_id = module_id
+        self.results = results
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__(self) -> str:
+        if self.ok:
+            return f"{self.__class__.__name__}<{self.module_id}: {len(self.results)} results>"
+
+        return f"{self.__class__.__name__}<{self.module_id}: {self.error!r}>"
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class SearchEngine:
+    """Runs one query against many search modules at once.
+
+    Every module is searched in its own worker thread. Results are yielded in
+    completion order, so a slow or failing store never holds up the others.
+    With `module_concurrency` set, at most that many searches run against the
+    same module at once, further searches wait for a free slot within their
+    timeout.
+    """
+
+    modules: dict[str, SearchModule] = None
+    registry: ModuleRegistry = None
+    timeout: float = None
+    max_workers: int = None
+    module_concurrency: int = None
+
+    _executor: ThreadPoolExecutor = None
+    _logger: logging.Logger = None
+
+    def __init__(
+        self,
+        modules: list[SearchModule] = None,
+        timeout: float = 10.0,
+        max_workers: int = None,
+        registry: ModuleRegistry = None,
+        module_concurrency: int = None,
+    ) -> None:
+        self._logger = logging.getLogger(f"{__name__}.{self.__class__.__name__}")
+
+        self.modules = {}
+        self.registry = registry
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.module_concurrency = module_concurrency
+
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._semaphores_lock = threading.Lock()
+
+        for module in modules or []:
+            self.add_module(module)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{list(self._get_modules().keys())}>"
+
+    def __enter__(self) -> "SearchEngine":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    # Modules
+
+    def add_module(self, module: SearchModule) -> None:
+        if module.id in self.modules:
+            raise ValueError(f"duplicate module id: {module.id}")
+
+        self.modules[module.id] = module
+        self._logger.debug(f" added module: {module.id}")
+
+    @classmethod
+    def from_directory(cls, path: str, **kwargs) -> "SearchEngine":
+        engine = cls(**kwargs)
+
+        for file_path in sorted(Path(path).glob(f"*{MODULE_FILE_EXTENSION}")):
+            try:
+                engine.add_module(SearchModule.from_compiled(str(file_path)))
+            except Exception as e:
+                engine._logger.error(f"Failed to load module: {file_path}")
+                engine._logger.exception(e)
+
+        engine._logger.info(f"Loaded {len(engine.modules)} modules from: {path}")
+
+        return engine
+
+    @classmethod
+    def from_registry(cls, registry: ModuleRegistry, **kwargs) -> "SearchEngine":
+        """Search the modules of a registry, picking up reloaded modules on every search."""
+
+        return cls(registry=registry, **kwargs)
+
+    def _get_modules(self) -> dict[str, SearchModule]:
+        if self.registry is None:
+            return self.modules
+
+        return {**self.registry.load_all(), **self.modules}
+
+    # Execution
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers or max(len(self._get_modules()), 1) * 4,
+                thread_name_prefix="trackr-search",
+            )
+
+        return self._executor
+
+    @contextmanager
+    def _module_slot(self, module_id: str, timeout: float) -> Iterator[None]:
+        if self.module_concurrency is None:
+            yield
+            return
+
+        with self._semaphores_lock:
+            semaphore = self._semaphores.setdefault(module_id, threading.BoundedSemaphore(self.module_concurrency))
+
+        if not semaphore.acquire(timeout=timeout):
+            raise TimeoutError(f"module {module_id} is busy")
+
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def _resolve_location(self, module_id: str, location: Any) -> tuple[bool, Any]:
+        if isinstance(location, dict):
+            return module_id in location, location.get(module_id)
+
+        return True, location
+
+    def search(
+        self, query: str, location: Any, timeout: float = None
+    ) -> Iterator[SearchResult]:
+        """Search all modules and yield a `SearchResult` per module as it finishes.
+
+        Args:
+            query (str): The search query.
+            location (Any): The location passed to every module, or a dict of
+                locations keyed by module id. Modules missing from the dict are skipped.
+            timeout (float): Per-module timeout in seconds, defaults to `self.timeout`.
+        """
+
+        timeout = self.timeout if timeout is None else timeout
+        executor = self._get_executor()
+
+        started: dict[str, float] = {}
+        pending: dict[Future, str] = {}
+
+        # modules are identified by their key in `_get_modules`, a registry keys them by file name
+        def run(module_id: str, module: SearchModule, module_location: Any) -> list[dict]:
+            started[module_id] = time.monotonic()
+
+            with self._module_slot(module_id, timeout):
+                return module.search(query, module_location)
+
+        for module_id, module in self._get_modules().items():
+            enabled, module_location = self._resolve_location(module_id, location)
+
+            if not enabled:
+                self._logger.debug(" no location for module %s, skipping", module_id)
+                continue
+
+            pending[executor.submit(run, module_id, module, module_location)] = module_id
+
+        while pending:
+            now = time.monotonic()
+            deadlines = [started[m] + timeout for m in pending.values() if m in started]
+
+            done, _ = wait(
+                pending,
+                timeout=max(min(deadlines) - now, 0) if deadlines else timeout,
+                return_when=FIRST_COMPLETED,
+            )
+
+            for future in done:
+                module_id = pending.pop(future)
+                elapsed = time.monotonic() - started.get(module_id, now)
+
+                if (error := future.exception()) is not None:
+                    self._logger.error(f"Module {module_id} failed: {error!r}")
+                    yield SearchResult(module_id, error=error, elapsed=elapsed)
+                else:
+                    yield SearchResult(module_id, results=future.result(), elapsed=elapsed)
+
+            now = time.monotonic()
+
+            for future, module_id in list(pending.items()):
+                if module_id in started and now - started[module_id] >= timeout:
+                    pending.pop(future)
+                    future.cancel()
+
+                    self._logger.warning(f"Module {module_id} timed out after {timeout}s")
+                    yield SearchResult(
+                        module_id,
+                        error=TimeoutError(f"module {module_id} timed out"),
+                        elapsed=now - started[module_id],
+                    )
+
+    def search_iter(
+        self, query: str, location: Any, timeout: float = None, errors: list[SearchResult] = None
+    ) -> Iterator[tuple[str, dict]]:
+        """Search all modules and yield `(module id, result)` pairs as soon as any
+        module produces a result.
+
+        Modules that fail or time out are logged and, when `errors` is given,
+        appended to it as `SearchResult`s. Results a module yielded before it
+        timed out are kept.
+        """
+
+        timeout = self.timeout if timeout is None else timeout
+        executor = self._get_executor()
+
+        done = object()
+        results: queue.Queue = queue.Queue()
+        started: dict[str, float] = {}
+        pending: set[str] = set()
+
+        def run(module_id: str, module: SearchModule, module_location: Any) -> None:
+            started[module_id] = time.monotonic()
+
+            try:
+                with self._module_slot(module_id, timeout):
+                    for result in module.search_iter(query, module_location):
+                        if module_id not in pending:
+                            return
+
+                        results.put((module_id, result))
+            except BaseException as e:
+                results.put((module_id, e))
+            else:
+                results.put((module_id, done))
+
+        def fail(module_id: str, error: BaseException) -> None:
+            pending.discard(module_id)
+
+            if errors is not None:
+                errors.append(SearchResult(module_id, error=error, elapsed=time.monotonic() - started.get(module_id, 0)))
+
+        for module_id, module in self._get_modules().items():
+            enabled, module_location = self._resolve_location(module_id, location)
+
+            if not enabled:
+                self._logger.debug(" no location for module %s, skipping", module_id)
+                continue
+
+            pending.add(module_id)
+            executor.submit(run, module_id, module, module_location)
+
+        while pending:
+            now = time.monotonic()
+            deadlines = [started[m] + timeout for m in pending if m in started]
+
+            try:
+                module_id, result = results.get(
+                    timeout=max(min(deadlines) - now, 0) if deadlines else timeout
+                )
+            except queue.Empty:
+                module_id, result = None, None
+
+            if module_id in pending:
+                if result is done:
+                    pending.discard(module_id)
+                elif isinstance(result, BaseException):
+                    self._logger.error(f"Module {module_id} failed: {result!r}")
+                    fail(module_id, result)
+                else:
+                    yield module_id, result
+
+            now = time.monotonic()
+
+            for module_id in [m for m in pending if m in started and now - started[m] >= timeout]:
+                self._logger.warning(f"Module {module_id} timed out after {timeout}s")
+                fail(module_id, TimeoutError(f"module {module_id} timed out"))
+
+    async def search_async(
+        self, query: str, location: Any, timeout: float = None
+    ) -> AsyncIterator[SearchResult]:
+        """Asyncio variant of `search`, modules run with `SearchModule.search_async`."""
+
+        import asyncio
+
+        timeout = self.timeout if timeout is None else timeout
+
+        async def run(module_id: str, module: SearchModule, module_location: Any) -> SearchResult:
+            start = time.monotonic()
+
+            try:
+                results = await asyncio.wait_for(module.search_async(query, module_location), timeout)
+            except TimeoutError:
+                self._logger.warning(f"Module {module_id} timed out after {timeout}s")
+                error = TimeoutError(f"module {module_id} timed out")
+            except Exception as e:
+                self._logger.error(f"Module {module_id} failed: {e!r}")
+                error = e
+            else:
+                return SearchResult(module_id, results=results, elapsed=time.monotonic() - start)
+
+            return SearchResult(module_id, error=error, elapsed=time.monotonic() - start)
+
+        tasks = []
+
+        for module_id, module in self._get_modules().items():
+            enabled, module_location = self._resolve_location(module_id, location)
+
+            if not enabled:
+                self._logger.debug(" no location for module %s, skipping", module_id)
+                continue
+
+            tasks.append(asyncio.create_task(run(module_id, module, module_location)))
+
+        for task in asyncio.as_completed(tasks):
+            yield await task
+
+    def search_all(self, query: str, location: Any, timeout: float = None) -> list[SearchResult]:
+        return list(self.search(query, location, timeout))
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,8 +1,250 @@
-import json, yaml
+import bisect, json, marshal, mmap, os, re, struct, sys
+from typing import Iterator
+
+
+ADDRESS_STOP_WORDS = frozenset({
+    'вул', 'вулиця', 'просп', 'проспект', 'пр', 'пров', 'провулок', 'бул', 'бульв', 'бульвар',
+    'пл', 'площа', 'буд', 'будинок', 'прим', 'шосе', 'обл', 'область', 'район', 'м', 'місто', 'смт',
+})
+
+
+def normalize(text: str) -> str:
+    """Normalize a location name for lookups. Example:
+    >>> normalize("вул. В. Вернадського, 22")
+    'в вернадського 22'
+
+    Case, punctuation, apostrophes and street type words are ignored.
+
+    Args:
+        text (str): The location name.
+
+    Returns:
+        str: The normalized name.
+    """
+
+    text = re.sub(r"['`’ʼ]", '', str(text).casefold())
+    tokens = re.sub(r'[\W_]+', ' ', text).split()
+
+    return ' '.join(token for token in tokens if token not in ADDRESS_STOP_WORDS)
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f'  {text} '
+
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LocationMatch:
+    city: str = None
+    street: str = None
+    value: str | int = None
+    score: float = None
+
+    def __init__(self, city: str, street: str, value: str | int, score: float) -> None:
+        self.city = city
+        self.street = street
+        self.value = value
+        self.score = score
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}<{self.city}, {self.street}: {self.value} ({self.score:.2f})>'
+
+
+class LocationIndex:
+    """Search index over city -> street -> store id location data.
+
+    Names are compared in their normalized form. Street lookups try, in order,
+    an exact match, a prefix match, a match on all query words (each may be a
+    word prefix) and finally a typo-tolerant trigram similarity.
+    """
+
+    FUZZY_THRESHOLD = 0.3
+
+    def __init__(self, data: dict) -> None:
+        self._cities: dict[str, str] = {}
+        self._city_keys: list[str] = []
+
+        # per city: sorted (normalized street, street, value) and word index
+        self._streets: dict[str, list[tuple[str, str, str | int]]] = {}
+        self._keys: dict[str, list[str]] = {}
+        self._words: dict[str, tuple[list[str], list[set[int]]]] = {}
+
+        self._addresses: dict[str, tuple[str, str]] = {}
+
+        for city, streets in data.items():
+            self._cities[normalize(city)] = city
+
+            if not isinstance(streets, dict):
+                self._addresses[str(streets)] = (city, None)
+                continue
+
+            entries = sorted((normalize(street), street, value) for street, value in streets.items())
+            words: dict[str, set[int]] = {}
+
+            for position, (key, street, value) in enumerate(entries):
+                self._addresses[str(value)] = (city, street)
+
+                for word in key.split():
+                    words.setdefault(word, set()).add(position)
+
+            word_keys = sorted(words)
+
+            self._streets[city] = entries
+            self._keys[city] = [entry[0] for entry in entries]
+            self._words[city] = (word_keys, [words[word] for word in word_keys])
+
+        self._city_keys = sorted(self._cities)
+        self._init_trigrams()
+
+    def _init_trigrams(self) -> None:
+        # trigrams are only needed by fuzzy lookups, they are built on the first one
+        self._city_trigrams: dict[str, set[str]] = None
+        self._trigram_cities: dict[str, list[str]] = None
+        self._trigrams: dict[str, list[set[str]]] = {}
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}<{len(self._cities)} cities, {len(self._addresses)} locations>'
+
+    def _similarity(self, a: set[str], b: set[str]) -> float:
+        return len(a & b) / len(a | b) if a or b else 0.0
+
+    def _city_trigram_index(self) -> tuple[dict[str, set[str]], dict[str, list[str]]]:
+        if self._city_trigrams is None:
+            city_trigrams, trigram_cities = {}, {}
+
+            for city_key in self._cities:
+                city_trigrams[city_key] = trigrams(city_key)
+
+                for trigram in city_trigrams[city_key]:
+                    trigram_cities.setdefault(trigram, []).append(city_key)
+
+            self._city_trigrams, self._trigram_cities = city_trigrams, trigram_cities
+
+        return self._city_trigrams, self._trigram_cities
+
+    def _street_trigrams(self, city: str) -> list[set[str]]:
+        if city not in self._trigrams:
+            self._trigrams[city] = [trigrams(key) for key in self._keys[city]]
+
+        return self._trigrams[city]
+
+    def find_city(self, query: str) -> str | None:
+        key = normalize(query)
+
+        if key in self._cities:
+            return self._cities[key]
+
+        position = bisect.bisect_left(self._city_keys, key)
+
+        if position < len(self._city_keys) and self._city_keys[position].startswith(key):
+            return self._cities[self._city_keys[position]]
+
+        city_trigrams, trigram_cities = self._city_trigram_index()
+        query_trigrams = trigrams(key)
+        shared: dict[str, int] = {}
+
+        for trigram in query_trigrams:
+            for candidate in trigram_cities.get(trigram, []):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        score, city_key = max(
+            (
+                (count / (len(query_trigrams) + len(city_trigrams[candidate]) - count), candidate)
+                for candidate, count in shared.items()
+            ),
+            default=(0.0, None),
+        )
+
+        return self._cities[city_key] if score >= self.FUZZY_THRESHOLD else None
+
+    def _word_matches(self, city: str, word: str) -> set[int]:
+        word_keys, positions = self._words[city]
+        matches = set()
+        index = bisect.bisect_left(word_keys, word)
+
+        while index < len(word_keys) and word_keys[index].startswith(word):
+            matches |= positions[index]
+            index += 1
+
+        return matches
+
+    def search(self, city: str, query: str, limit: int = 5) -> list[LocationMatch]:
+        """Find the best matching streets of a city.
+
+        Args:
+            city (str): The city, matched with `find_city`.
+            query (str): The street query, e.g. "Вернадського 22".
+            limit (int): The maximum number of matches.
+
+        Returns:
+            list[LocationMatch]: Matches ordered by score, best first.
+        """
+
+        city = self.find_city(city)
+
+        if city is None or city not in self._streets:
+            return []
+
+        entries, keys = self._streets[city], self._keys[city]
+        key = normalize(query)
+        scores: dict[int, float] = {}
+
+        position = bisect.bisect_left(keys, key)
+
+        while position < len(keys) and keys[position].startswith(key):
+            scores[position] = 1.0 if keys[position] == key else 0.9
+            position += 1
+
+        if len(scores) < limit and key:
+            words = [self._word_matches(city, word) for word in key.split()]
+
+            for position in set.intersection(*words):
+                scores.setdefault(position, 0.8)
+
+        if len(scores) < limit:
+            query_trigrams = trigrams(key)
+
+            for position, street_trigrams in enumerate(self._street_trigrams(city)):
+                if position not in scores:
+                    similarity = self._similarity(query_trigrams, street_trigrams)
+
+                    if similarity >= self.FUZZY_THRESHOLD:
+                        scores[position] = 0.7 * similarity
+
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+        return [LocationMatch(city, entries[p][1], entries[p][2], score) for p, score in best]
+
+    def address(self, value: str | int) -> tuple[str, str] | None:
+        return self._addresses.get(str(value), None)
+
+    def dumps(self) -> bytes:
+        """Serialize the index without its trigrams, see `loads`."""
+
+        state = (self._cities, self._city_keys, self._streets, self._keys, self._words, self._addresses)
+
+        return bytes(sys.version_info[:2]) + marshal.dumps(state)
+
+    @classmethod
+    def loads(cls, data: bytes) -> 'LocationIndex | None':
+        """Load an index serialized by `dumps`, None if it was written by another interpreter version."""
+
+        # like compiled expressions, marshal data is only read by the version that wrote it
+        if tuple(data[:2]) != sys.version_info[:2]:
+            return None
+
+        index = cls.__new__(cls)
+        index._cities, index._city_keys, index._streets, index._keys, index._words, index._addresses = (
+            marshal.loads(data[2:])
+        )
+        index._init_trigrams()
+
+        return index
 
 
 class LocationData:
     _data: dict = None
+    _index: LocationIndex = None
 
     def __init__(self, data: dict) -> None:
         self._data = data
@@ -30,10 +272,36 @@ class LocationData:
     def cities(self) -> list:
         return list(self._data.keys())
 
+    @property
+    def index(self) -> LocationIndex:
+        if self._index is None:
+            self._index = LocationIndex(self._data)
+
+        return self._index
+
+    def locations(self) -> Iterator[tuple[str, str, str | int]]:
+        """Iterate over every `(city, street, store id)`."""
+
+        for city, streets in self._data.items():
+            for street, value in streets.items():
+                yield city, street, value
+
+    def find(self, city: str, street: str, limit: int = 5) -> list[LocationMatch]:
+        """Find locations by a possibly incomplete or misspelled city and street."""
+
+        return self.index.search(city, street, limit)
+
+    def address(self, value: str | int) -> tuple[str, str] | None:
+        """Reverse lookup of the `(city, street)` for a store id."""
+
+        return self.index.address(value)
+
     @classmethod
     def from_file(cls, file_path: str) -> 'LocationData':
         with open(file_path, 'r') as file:
             if file_path.endswith('.yaml'):
+                import yaml
+
                 data = yaml.safe_load(file)
             elif file_path.endswith('.json'):
                 data = json.load(file)
@@ -41,3 +309,274 @@ class LocationData:
                 raise ValueError('invalid file extension')
 
         return cls(data)
+
+
+class CompactLocationData(LocationData):
+    """Read-only `LocationData` backed by the compact binary location format.
+
+    The data is embedded in compiled modules (see `ModuleFile`), the file is
+    memory-mapped and nothing is decoded up front, so opening it is O(1) and
+    worker processes share the same page-cached data. Layout, all integers
+    little-endian:
+
+        header   magic, version, string count, city count, street count
+        strings  string count + 1 offsets, followed by the UTF-8 string data
+        cities   (name id, first street, street count), sorted by name
+        streets  (name id, value, value kind), sorted by name within a city
+
+    Strings are interned, so every distinct name or value is stored once.
+    """
+
+    MAGIC = b'TRKL'
+    FORMAT_VERSION = 1
+
+    _HEADER = struct.Struct('<4sHHIII')
+    _OFFSET = struct.Struct('<I')
+    _CITY = struct.Struct('<III')
+    _STREET = struct.Struct('<III')
+
+    # value kinds
+    _INT = 0
+    _STRING = 1
+
+    _buffer = None
+    _path: str = None
+    _offset: int = 0
+    _length: int = 0
+
+    # section of the `LocationIndex` built at compile time, see `ModuleFile`
+    _index_offset: int = 0
+    _index_length: int = 0
+
+    def __init__(self, buffer, path: str = None, offset: int = 0, length: int = 0) -> None:
+        self._buffer = buffer
+        self._path = path
+        self._offset = offset
+        self._length = length
+
+        magic, version, _, self._string_count, self._city_count, self._street_count = (
+            self._HEADER.unpack_from(buffer, 0)
+        )
+
+        if magic != self.MAGIC:
+            raise ValueError('invalid compact location data')
+
+        if version != self.FORMAT_VERSION:
+            raise ValueError(f'unsupported compact location data version: {version}')
+
+        self._strings_offset = self._HEADER.size
+        self._data_offset = self._strings_offset + (self._string_count + 1) * self._OFFSET.size
+        self._cities_offset = self._data_offset + self._string_offset(self._string_count)
+        self._streets_offset = self._cities_offset + self._city_count * self._CITY.size
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self._path}>"
+
+    def __getstate__(self) -> dict:
+        if self._path is None:
+            return {'_buffer': bytes(self._buffer), '_path': None}
+
+        return {
+            '_buffer': None,
+            '_path': self._path,
+            '_offset': self._offset,
+            '_length': self._length,
+            '_index_offset': self._index_offset,
+            '_index_length': self._index_length,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        if state['_buffer'] is not None:
+            self.__init__(state['_buffer'])
+        else:
+            # the file is mapped again on first access
+            self._buffer = None
+            self._path = state['_path']
+            self._offset = state['_offset']
+            self._length = state['_length']
+            self._index_offset = state['_index_offset']
+            self._index_length = state['_index_length']
+
+    def _ensure_open(self) -> None:
+        if self._buffer is None:
+            with open(self._path, 'rb') as file:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            if self._offset or self._length:
+                buffer = memoryview(buffer)[self._offset:self._offset + (self._length or len(buffer))]
+
+            self.__init__(buffer, self._path, self._offset, self._length)
+
+    # Decoding
+
+    def _string_offset(self, string_id: int) -> int:
+        return self._OFFSET.unpack_from(self._buffer, self._strings_offset + string_id * self._OFFSET.size)[0]
+
+    def _bytes(self, string_id: int) -> bytes:
+        start = self._data_offset + self._string_offset(string_id)
+        end = self._data_offset + self._string_offset(string_id + 1)
+
+        return bytes(self._buffer[start:end])
+
+    def _string(self, string_id: int) -> str:
+        return self._bytes(string_id).decode('utf-8')
+
+    def _city(self, index: int) -> tuple[int, int, int]:
+        return self._CITY.unpack_from(self._buffer, self._cities_offset + index * self._CITY.size)
+
+    def _street(self, index: int) -> tuple[int, int, int]:
+        return self._STREET.unpack_from(self._buffer, self._streets_offset + index * self._STREET.size)
+
+    def _value(self, value: int, kind: int) -> str | int:
+        return value if kind == self._INT else self._string(value)
+
+    def _search(self, key: str, start: int, count: int, record) -> int | None:
+        key = key.encode('utf-8')
+        low, high = start, start + count
+
+        while low < high:
+            middle = (low + high) // 2
+            name = self._bytes(record(middle)[0])
+
+            if name < key:
+                low = middle + 1
+            elif name > key:
+                high = middle
+            else:
+                return middle
+
+        return None
+
+    def _streets(self, city: str) -> dict | None:
+        if (index := self._search(city, 0, self._city_count, self._city)) is None:
+            return None
+
+        _, first, count = self._city(index)
+
+        return {
+            self._string(name): self._value(value, kind)
+            for name, value, kind in map(self._street, range(first, first + count))
+        }
+
+    # LocationData
+
+    def __getitem__(self, key: tuple | str) -> str:
+        if not isinstance(key, tuple):
+            raise ValueError('Key must be a tuple')
+
+        self._ensure_open()
+
+        if len(key) == 1:
+            return self._streets(key[0])
+        elif len(key) == 2:
+            city, street = key
+
+            if (index := self._search(city, 0, self._city_count, self._city)) is None:
+                return None
+
+            _, first, count = self._city(index)
+
+            if (index := self._search(street, first, count, self._street)) is None:
+                return None
+
+            _, value, kind = self._street(index)
+
+            return self._value(value, kind)
+        else:
+            raise ValueError('Key must be a tuple with length of 1 or 2')
+
+    def __len__(self) -> int:
+        self._ensure_open()
+
+        return self._city_count
+
+    @property
+    def cities(self) -> list:
+        self._ensure_open()
+
+        return [self._string(self._city(index)[0]) for index in range(self._city_count)]
+
+    @property
+    def _data(self) -> dict:
+        return {city: self._streets(city) for city in self.cities}
+
+    def _load_index(self) -> LocationIndex | None:
+        if not self._index_length:
+            return None
+
+        with open(self._path, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                return LocationIndex.loads(buffer[self._index_offset:self._index_offset + self._index_length])
+
+    @property
+    def index(self) -> LocationIndex:
+        # loaded on the first lookup, only rebuilt from the data without a stored index
+        if self._index is None:
+            self._index = self._load_index() or LocationIndex(self._data)
+
+        return self._index
+
+    @classmethod
+    def from_file(
+        cls, file_path: str, offset: int = 0, length: int = 0, index_offset: int = 0, index_length: int = 0
+    ) -> 'CompactLocationData':
+        """Map compact location data from a file, optionally embedded at `offset` together
+        with a serialized `LocationIndex` at `index_offset`."""
+
+        # absolute, so pickled data stays valid in processes with another working directory
+        data = cls.__new__(cls)
+        data._path = os.path.abspath(file_path)
+        data._offset = offset
+        data._length = length
+        data._index_offset = index_offset
+        data._index_length = index_length
+        data._ensure_open()
+
+        return data
+
+    @classmethod
+    def encode(cls, data: dict) -> bytes:
+        """Encode location data in the compact binary format."""
+
+        strings = set()
+
+        for city, streets in data.items():
+            if not isinstance(streets, dict):
+                raise ValueError(f'invalid streets for city: {city}')
+
+            strings.add(city)
+            strings.update(streets.keys())
+            strings.update(v for v in streets.values() if not (isinstance(v, int) and 0 <= v < 2 ** 32))
+
+        strings = sorted(map(str, strings))
+        string_ids = {string: index for index, string in enumerate(strings)}
+        encoded = [string.encode('utf-8') for string in strings]
+
+        cities, streets = bytearray(), bytearray()
+
+        for city in sorted(data):
+            cities += cls._CITY.pack(string_ids[city], len(streets) // cls._STREET.size, len(data[city]))
+
+            for street in sorted(data[city]):
+                value = data[city][street]
+
+                if isinstance(value, int) and 0 <= value < 2 ** 32:
+                    streets += cls._STREET.pack(string_ids[street], value, cls._INT)
+                else:
+                    streets += cls._STREET.pack(string_ids[street], string_ids[str(value)], cls._STRING)
+
+        offsets, position = bytearray(), 0
+
+        for string in encoded:
+            offsets += cls._OFFSET.pack(position)
+            position += len(string)
+
+        offsets += cls._OFFSET.pack(position)
+
+        return b''.join([
+            cls._HEADER.pack(cls.MAGIC, cls.FORMAT_VERSION, 0, len(strings), len(data), len(streets) // cls._STREET.size),
+            offsets,
+            *encoded,
+            cities,
+            streets,
+        ])
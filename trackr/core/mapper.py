@@ -0,0 +1,165 @@
+import logging
+from typing import Callable, Iterable, Iterator
+
+from .constructors import Constructor, DynamicConstructor, KIND_SEARCH, KIND_CONSTANT
+from .results import ResultBatch
+from .utility import DotPath
+
+
+logger = logging.getLogger(__name__)
+
+
+def _guard(func: Callable) -> Callable:
+    # mirrors DynamicConstructor._safe_execute for fields with safe="false"
+    def guarded(item):
+        try:
+            return func(item)
+        except Exception:
+            return None
+
+    return guarded
+
+
+class ResultMapper:
+    """Maps the result list of a search to result dicts in a single pass.
+
+    The `result_mapping` section is compiled once into a specialized function
+    containing one list comprehension. Plain keys are inlined, dot paths use
+    precompiled `DotPath` accessors, attribute constructors are evaluated once
+    per search and computed constructors are turned into functions of the item
+    variable (see `DynamicConstructor.compile_function`), so per item only the
+    field expressions themselves are executed.
+    Computed fields found not to read the item are evaluated once per search. An
+    optional computed `where` expression skips the items it is false for.
+    """
+
+    attribute: str = None
+    attribute_path: DotPath = None
+    variable_name: str = None
+    mapping: dict = None
+    fields: tuple[str, ...] = None
+    where: DynamicConstructor = None
+
+    source: str = None
+
+    def __init__(self, result_mapping: dict) -> None:
+        self.attribute = result_mapping.get("attribute", None)
+        self.mapping = result_mapping.get("mapping", None)
+        self.variable_name = result_mapping.get("variable_name", "item")
+        self.where = result_mapping.get("where", None)
+
+        if self.attribute is None:
+            raise ValueError("missing result attribute")
+
+        if not isinstance(self.mapping, dict):
+            raise ValueError("missing result mapping")
+
+        if self.where is not None and not (isinstance(self.where, DynamicConstructor) and self.where.type == "computed"):
+            raise ValueError("where must be a computed constructor")
+
+        self.attribute_path = DotPath(self.attribute)
+
+        self._constants: dict[str, Constructor] = {}
+        self._functions: dict[str, DynamicConstructor] = {}
+        self._function_code = {}
+        self._paths: dict[str, DotPath] = {}
+
+        fields = []
+        columns, constants = {}, {}
+
+        for index, (key, value) in enumerate(self.mapping.items()):
+            # computed fields not reading the item are evaluated once per search like attributes
+            per_search = isinstance(value, DynamicConstructor) and value.kind in (KIND_SEARCH, KIND_CONSTANT)
+
+            if isinstance(value, DynamicConstructor) and value.type == "computed" and not per_search:
+                name = f"f{index}"
+                self._functions[name] = value
+                self._function_code[name] = value.compile_function(self.variable_name)
+                columns[key] = f"{name}(item)"
+            elif isinstance(value, Constructor):
+                name = f"c{index}"
+                self._constants[name] = value
+                constants[key] = name
+            elif "." in str(value):
+                name = f"p{index}"
+                self._paths[name] = DotPath(value)
+                columns[key] = f"{name}(item)"
+            else:
+                columns[key] = f"item.get({value!r})"
+
+            fields.append(f"{key!r}: {columns[key] if key in columns else constants[key]}")
+
+        self.fields = tuple(self.mapping)
+
+        condition = skip = ""
+
+        if self.where is not None:
+            self._functions["w"] = self.where
+            self._function_code["w"] = self.where.compile_function(self.variable_name)
+            condition = " if w(item)"
+            skip = "        if not w(item):\n            continue\n"
+
+        arguments = ", ".join(["items", *self._paths, *self._constants, *self._functions])
+
+        record = f"{{{', '.join(fields)}}}"
+
+        self.source = (
+            f"def map_results({arguments}):\n"
+            f"    return [{record} for item in items{condition}]\n"
+            f"\n"
+            f"def iter_results({arguments}):\n"
+            f"    for item in items:\n"
+            f"{skip}"
+            f"        yield {record}\n"
+            f"\n"
+            f"def map_columns({arguments}):\n"
+            f"    items = [item for item in items{condition}]\n"
+            f"    return {{{', '.join(f'{key!r}: [{value} for item in items]' for key, value in columns.items())}}}, "
+            f"{{{', '.join(f'{key!r}: {value}' for key, value in constants.items())}}}, len(items)\n"
+        )
+
+        namespace = {}
+        exec(compile(self.source, "<result mapper>", "exec"), namespace)
+
+        self._map = namespace["map_results"]
+        self._iter = namespace["iter_results"]
+        self._columns = namespace["map_columns"]
+
+        logger.debug("Compiled result mapper:\n%s", self.source)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.attribute}: {list(self.mapping.keys())}>"
+
+    @property
+    def evals_per_item(self) -> int:
+        """Number of computed field evaluations per mapped item."""
+
+        return len(self._functions) - (self.where is not None)
+
+    def _arguments(self, parent: object, items: Iterable = None) -> list:
+        if items is None:
+            items = self.attribute_path.get(parent.attributes)
+
+        arguments = [items, *[path.get for path in self._paths.values()]]
+        arguments.extend(value(parent) for value in self._constants.values())
+
+        for name, value in self._functions.items():
+            function = eval(self._function_code[name], value.namespace(parent))
+            arguments.append(function if value.safe else _guard(function))
+
+        return arguments
+
+    def __call__(self, parent: object, items: Iterable = None) -> list[dict]:
+        return self._map(*self._arguments(parent, items))
+
+    def iter(self, parent: object, items: Iterable = None) -> Iterator[dict]:
+        """Lazily map results, items are pulled from `items` one at a time."""
+
+        return self._iter(*self._arguments(parent, items))
+
+    def columns(self, parent: object, items: Iterable = None) -> ResultBatch:
+        """Map results into a `ResultBatch`, attribute fields are evaluated and stored once."""
+
+        columns, constants, length = self._columns(*self._arguments(parent, items))
+
+        return ResultBatch(self.fields, columns, constants, length)
@@ -0,0 +1,175 @@
+import logging, time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Callable
+
+
+logger = logging.getLogger(__name__)
+
+
+# the innermost open span, context variables are copied into asyncio tasks and
+# `asyncio.to_thread`, so spans of concurrently running actions nest correctly
+_current_span: ContextVar["Span"] = ContextVar("trackr_span", default=None)
+
+_hooks: list[Callable[["SearchMetrics"], None]] = []
+
+
+class Span:
+    """A timed part of a search, used as a context manager."""
+
+    name: str = None
+    parent: "Span" = None
+    attributes: dict = None
+    start: float = None
+    end: float = None
+
+    def __init__(self, metrics: "SearchMetrics", name: str, attributes: dict) -> None:
+        self.name = name
+        self.attributes = attributes
+
+        self._metrics = metrics
+        self._token = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.path}: {self.duration * 1000:.3f}ms>"
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+
+        self.parent = parent if parent is not None and parent._metrics is self._metrics else None
+        self._token = _current_span.set(self)
+        self._metrics.spans.append(self)
+        self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.end = time.perf_counter()
+
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # exited in another context, e.g. a search generator resumed on another thread
+            _current_span.set(self.parent)
+
+    @property
+    def duration(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) if self.start is not None else 0.0
+
+    @property
+    def depth(self) -> int:
+        return 0 if self.parent is None else self.parent.depth + 1
+
+    @property
+    def path(self) -> str:
+        return self.name if self.parent is None else f"{self.parent.path}/{self.name}"
+
+
+class SearchMetrics:
+    """Spans and counters collected while a single search runs.
+
+    Spans are opened with `span` around actions and their phases (`http`,
+    `decode`, `eval`, ...), counters such as `bytes_received`, `items_mapped`
+    and `eval_calls` are increased with `count`. When the search finishes the
+    metrics are passed to every hook registered with `add_hook`.
+
+    Searches that were `coalesced` into an identical search running at the
+    same time only have a `search` span covering the wait, the work is
+    recorded in the metrics of the search they joined.
+    """
+
+    module_id: str = None
+    query: str = None
+    location: Any = None
+    spans: list[Span] = None
+    counters: Counter = None
+    error: BaseException = None
+    coalesced: bool = False
+
+    def __init__(self, module_id: str = None, query: str = None, location: Any = None) -> None:
+        self.module_id = module_id
+        self.query = query
+        self.location = location
+        self.spans = []
+        self.counters = Counter()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.module_id}: {len(self.spans)} spans, {dict(self.counters)}>"
+
+    def span(self, name: str, **attributes) -> Span:
+        return Span(self, name, attributes)
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    @property
+    def elapsed(self) -> float:
+        return sum(span.duration for span in self.spans if span.parent is None)
+
+    def totals(self) -> dict[str, float]:
+        """Total seconds spent per span name, e.g. in all `http` phases."""
+
+        totals = Counter()
+
+        for span in self.spans:
+            totals[span.name] += span.duration
+
+        return dict(totals)
+
+    def finish(self, error: BaseException = None) -> None:
+        self.error = error
+
+        for hook in list(_hooks):
+            try:
+                hook(self)
+            except Exception as e:
+                logger.error("Metrics hook %r failed", hook)
+                logger.exception(e)
+
+    def as_dict(self) -> dict:
+        return {
+            "module": self.module_id,
+            "query": self.query,
+            "location": self.location,
+            "elapsed": self.elapsed,
+            "error": repr(self.error) if self.error is not None else None,
+            "coalesced": self.coalesced,
+            "spans": [
+                {"path": span.path, "duration": span.duration, **span.attributes} for span in self.spans
+            ],
+            "counters": dict(self.counters),
+        }
+
+    def format(self) -> str:
+        """Human readable breakdown of the search, one line per span."""
+
+        elapsed = self.elapsed or float("inf")
+        coalesced = ", coalesced" if self.coalesced else ""
+        lines = [f"{self.module_id}: {self.query!r} @ {self.location!r} ({self.elapsed * 1000:.3f}ms{coalesced})"]
+
+        for span in self.spans:
+            label = "  " * (span.depth + 1) + span.name
+            details = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+            lines.append(
+                f"{label:<32} {span.duration * 1000:>10.3f}ms {span.duration / elapsed:>6.1%}  {details}".rstrip()
+            )
+
+        if self.counters:
+            lines.append("  " + ", ".join(f"{key}={value}" for key, value in sorted(self.counters.items())))
+
+        return "\n".join(lines)
+
+
+def add_hook(hook: Callable[[SearchMetrics], None]) -> None:
+    """Call `hook` with the `SearchMetrics` of every finished search.
+
+    Hooks run on the thread that ran the search and should return quickly.
+    """
+
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[SearchMetrics], None]) -> None:
+    if hook in _hooks:
+        _hooks.remove(hook)
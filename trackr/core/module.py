@@ -1,34 +1,77 @@
-import codecs, yaml, logging, pickle
-from typing import Any
+import logging, threading
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator
 from pathlib import Path
 
 from trackr import VERSION
 
+from .context import SearchContext, SEARCH_ATTRIBUTES
+from .metrics import SearchMetrics
 from .location import LocationData
-from .utility import get_by_dot_path, has_keys, error_exit
+from .mapper import ResultMapper
+from .results import ResultBatch
+from .cache import ResponseCache, CachingTransport, DEFAULT_CACHE_SIZE, DEFAULT_CACHE_TTL
+from .singleflight import SingleFlight, CoalescingTransport
+from .ratelimit import RateLimitedTransport
+from .transport import Transport, get_transport, RETRY_STATUSES
+from .utility import has_keys, error_exit
+from .compiled import ModuleFile
 from .constructors import (
     Constructor,
     DynamicConstructor,
+    collect_references,
     compute_dynamic_attributes,
+    iter_constructors,
 )
-from .actions import Action, UpdateAttributeAction, RequestAction, ChainUpdateAction
+from .actions import Action, UpdateAttributeAction, RequestAction, PaginateAction, ChainUpdateAction
+from .scheduler import ActionGraph
 
 
-yaml.SafeLoader.add_constructor("!dynamic", DynamicConstructor.from_yaml)
+DEFAULT_CONCURRENCY = 8
+
+_yaml_loader = None
+_flights_lock = threading.Lock()
+
+
+def get_yaml_loader():
+    """YAML loader for search modules, a `SafeLoader` knowing the `!dynamic` tag.
+
+    `yaml` is only imported when the first module is loaded from YAML, compiled
+    modules never need it.
+    """
+
+    global _yaml_loader
+
+    if _yaml_loader is None:
+        import yaml
+
+        class ModuleLoader(yaml.SafeLoader):
+            pass
+
+        ModuleLoader.add_constructor("!dynamic", DynamicConstructor.from_yaml)
+        _yaml_loader = ModuleLoader
+
+    return _yaml_loader
 
 
 class SearchModule:
     _data: dict = None
     _file_path: str = None
+    _location_file: str = None
 
     _trackr_section: dict = None
     _meta_section: dict = None
     _main_section: dict = None
 
     _logger: logging.Logger = None
+    _transport: Transport = None
+    _cache: ResponseCache = None
+    _result_mapper: ResultMapper = None
+    _flights: SingleFlight = None
 
     attributes: dict = None
     actions: list[Action] = None
+    action_graph: ActionGraph = None
     location_data: LocationData = None
 
     def __init__(
@@ -48,6 +91,9 @@ class SearchModule:
         self._load_attributes()
         self._load_actions()
         self._load_result_mapping()
+        self._analyze_expressions()
+        self._fuse_pipelines()
+        self._build_action_graph()
 
         if self.is_compilation:
             self._prepare_compilation()
@@ -70,7 +116,7 @@ class SearchModule:
         self.attributes = init_section.get("attributes", {}) if init_section else {}
         self.attributes.update({"$module": self._meta_section})
 
-        self._logger.debug(f" attributes={list(self.attributes.keys())}")
+        self._logger.debug(" attributes=%s", list(self.attributes.keys()))
 
     def _load_actions(self):
         self._logger.debug("Loading actions")
@@ -94,14 +140,16 @@ class SearchModule:
                 self.actions.append(UpdateAttributeAction(action_type, action_args))
             elif action_type == "request":
                 self.actions.append(RequestAction(action_type, action_args))
+            elif action_type == "paginate":
+                self.actions.append(PaginateAction(action_type, action_args))
             elif action_type == "chain_update":
                 self.actions.append(ChainUpdateAction(action_type, action_args))
             else:
                 raise ValueError(f"Invalid action type: {action_type}")
 
-            self._logger.debug(f" loaded action: {action_type}")
+            self._logger.debug(" loaded action: %s", action_type)
 
-        self._logger.debug(f" actions={self.actions}")
+        self._logger.debug(" actions=%s", self.actions)
 
     def _load_result_mapping(self):
         self._logger.debug("Loading result mapping")
@@ -113,9 +161,15 @@ class SearchModule:
         if not isinstance(result_mapping_section, dict):
             error_exit(self._logger, "invalid result mapping section")
 
+        if result_mapping_section.get("attribute", None) is None:
+            error_exit(self._logger, "missing result attribute")
+
+        if result_mapping_section.get("mapping", None) is None:
+            error_exit(self._logger, "missing result mapping")
+
         self.result_mapping = result_mapping_section
 
-        self._logger.debug(f" result_mapping={self.result_mapping}")
+        self._logger.debug(" result_mapping=%s", self.result_mapping)
 
     def _load_sections(self):
         self._logger.debug("Loading sections")
@@ -136,9 +190,9 @@ class SearchModule:
         if not has_keys(self._meta_section, ["id", "enabled", "version"]):
             error_exit(self._logger, "missing required meta section keys")
 
-        self._logger.debug(f" meta={self._meta_section.keys()}")
-        self._logger.debug(f" main={self._main_section.keys()}")
-        self._logger.debug(f" trackr={self._trackr_section.keys()}")
+        self._logger.debug(" meta=%s", self._meta_section.keys())
+        self._logger.debug(" main=%s", self._main_section.keys())
+        self._logger.debug(" trackr=%s", self._trackr_section.keys())
 
     def _load_location_data(self):
         self._logger.debug("Loading location data")
@@ -158,54 +212,117 @@ class SearchModule:
                 error_exit(self._logger, f"invalid location data path: {location_data}")
 
             self.location_data = LocationData.from_file(str(file_path))
-            self._logger.debug(f" loaded location data from {file_path}")
+            self._location_file = str(file_path)
+            self._logger.debug(" loaded location data from %s", file_path)
         else:
             error_exit(self._logger, "invalid location data section")
 
-        self._logger.debug(f" location_data={self.location_data}")
+        self._logger.debug(" location_data=%s", self.location_data)
 
-    # Evaluation
+    def _analyze_expressions(self):
+        self._logger.debug("Analyzing expressions")
 
-    def _execute_actions(self):
-        self._logger.info("Executing actions")
+        # everything a search can read: module and context attributes and action outputs
+        attributes = set(self.attributes) | SEARCH_ATTRIBUTES
 
-        for action in self.actions:
-            action(self)
+        for action in self.actions or []:
+            attributes |= action.outputs
 
-    def _map_results(self) -> list[dict]:
-        self._logger.debug("Mapping results")
+        def analyze(root: Any, variables: set[str] = frozenset()) -> None:
+            for constructor in iter_constructors(root):
+                if isinstance(constructor, DynamicConstructor):
+                    constructor.analyze(attributes, variables)
+
+        analyze(self.attributes)
+
+        for action in self.actions or []:
+            if isinstance(action, ChainUpdateAction) and "attribute" in action.args:
+                attribute = action.args["attribute"]
+                analyze(action.args, {attribute[1:] if attribute.startswith("$") else attribute})
+            else:
+                analyze(action.args)
+
+        analyze(self.result_mapping, {self.result_mapping.get("variable_name", "item")})
+
+    def _fuse_pipelines(self):
+        self._logger.debug("Fusing chain updates")
 
         result_attribute = self.result_mapping.get("attribute", None)
-        mapping = self.result_mapping.get("mapping", None)
-        variable_name = self.result_mapping.get("variable_name", "item")
 
-        if result_attribute is None:
-            error_exit(self._logger, "missing result attribute")
+        # mapping fields and `where` reading the attribute itself need the materialized value
+        mapping_inputs = collect_references(self.result_mapping)
 
-        if mapping is None:
-            error_exit(self._logger, "missing result mapping")
+        for index, action in enumerate(self.actions or []):
+            if not isinstance(action, ChainUpdateAction):
+                continue
+
+            # the result may stay lazy when it is only iterated once by the result mapping
+            attribute = action.args.get("attribute", None)
+            later_inputs = set().union(*[later.inputs for later in self.actions[index + 1:]], mapping_inputs)
+            lazy = attribute == result_attribute and attribute not in later_inputs
+
+            if action.fuse(lazy):
+                self._logger.debug(" fused %s: %s", attribute, action.pipeline.value)
+
+    def _build_action_graph(self):
+        self._logger.debug("Building action graph")
 
-        results = []
+        # the inputs of the actions include the dependencies inferred by `_analyze_expressions`
+        if self.actions is not None:
+            self.action_graph = ActionGraph(self.actions)
 
-        for item in get_by_dot_path(self.attributes, result_attribute):
-            result = {}
+        self._logger.debug(" action_graph=%s", self.action_graph)
 
-            for key, value in mapping.items():
-                if isinstance(value, Constructor):
-                    if value.type == "computed":
-                        value.prepare(self)
-                        value.dependencies.update({variable_name: item})
+    # Evaluation
+
+    def _execute_actions(self, context: SearchContext):
+        self._logger.info("Executing actions")
+
+        for index, action in enumerate(self.actions):
+            with context.metrics.span(action.action, index=index):
+                action(context)
+
+    async def _execute_actions_async(self, context: SearchContext):
+        self._logger.info("Executing actions concurrently")
+
+        await self.action_graph.run(context)
+
+    def _map_results(self, context: SearchContext, items: list = None) -> list[dict]:
+        self._logger.debug("Mapping results")
 
-                    result[key] = value(self)
-                else:
-                    result[key] = get_by_dot_path(item, value)
+        with context.metrics.span("map"):
+            results = self.result_mapper(context, items)
 
-            results.append(result)
+        context.metrics.count("items_mapped", len(results))
+        context.metrics.count("eval_calls", len(results) * self.result_mapper.evals_per_item)
 
-        self._logger.debug(f" mapped {len(results)} results")
+        self._logger.debug(" mapped %d results", len(results))
 
         return results
 
+    def _map_columns(self, context: SearchContext) -> ResultBatch:
+        self._logger.debug("Mapping results to columns")
+
+        with context.metrics.span("map"):
+            batch = self.result_mapper.columns(context)
+
+        context.metrics.count("items_mapped", len(batch))
+        context.metrics.count("eval_calls", len(batch) * self.result_mapper.evals_per_item)
+
+        return batch
+
+    @contextmanager
+    def _measure(self, context: SearchContext) -> Iterator[None]:
+        # the `search` span covers the whole search, hooks get the metrics once it ended
+        try:
+            with context.metrics.span("search"):
+                yield
+        except BaseException as e:
+            context.metrics.finish(e)
+            raise
+        else:
+            context.metrics.finish()
+
     # Compilation
 
     def _prepare_compilation(self):
@@ -214,11 +331,23 @@ class SearchModule:
         self._logger.debug(" preparing attributes")
         self._prepare_attributes_compilation()
 
+        self._logger.debug(" precompiling actions and result mapping")
+        self._prepare_expressions_compilation()
+
         self._logger.info("Module is ready for compilation")
 
     def _prepare_attributes_compilation(self):
         compute_dynamic_attributes(self, self.attributes, prepare=True)
 
+    def _prepare_expressions_compilation(self):
+        for action in self.actions or []:
+            compute_dynamic_attributes(self, action.args, prepare=True)
+
+        compute_dynamic_attributes(self, self.result_mapping, prepare=True)
+
+        # compiles the per-item functions of the mapping, which are stored with the expressions
+        self.result_mapper
+
     # Misc
 
     def _check_trackr_version(self):
@@ -238,17 +367,145 @@ class SearchModule:
                 f"module requires trackr v{self._trackr_section['minversion']} or higher",
             )
 
+    def __getstate__(self) -> dict:
+        # transports hold open connections, caches are process local and
+        # generated mappers and in-flight searches cannot be pickled, all are
+        # recreated on first use
+        state = self.__dict__.copy()
+        state.pop("_transport", None)
+        state.pop("_cache", None)
+        state.pop("_result_mapper", None)
+        state.pop("_flights", None)
+
+        return state
+
     # Public
 
+    @property
+    def id(self) -> str:
+        return self._meta_section["id"]
+
+    @property
+    def source_files(self) -> list[str]:
+        """The module YAML and the data files it was built from."""
+
+        return [path for path in [self._file_path, self._location_file] if path]
+
+    def iter_constructors(self) -> Iterator[Constructor]:
+        yield from iter_constructors(self.attributes)
+
+        for action in self.actions or []:
+            yield from iter_constructors(action.args)
+
+        yield from iter_constructors(self.result_mapping)
+
+    @property
+    def result_mapper(self) -> ResultMapper:
+        if self._result_mapper is None:
+            self._result_mapper = ResultMapper(self.result_mapping)
+
+        return self._result_mapper
+
+    @property
+    def cache(self) -> ResponseCache | None:
+        """Response cache configured in the `trackr.cache` section, if any."""
+
+        cache_section = self._trackr_section.get("cache", None)
+
+        if self._cache is None and cache_section:
+            self._cache = ResponseCache(
+                max_size=int(cache_section.get("max_size", DEFAULT_CACHE_SIZE)),
+                ttl=float(cache_section.get("ttl", DEFAULT_CACHE_TTL)),
+                path=cache_section.get("path", None),
+            )
+
+        return self._cache
+
+    @property
+    def coalesce(self) -> bool:
+        """Whether identical concurrent searches and requests share one execution (`trackr.coalesce`, off by default)."""
+
+        return bool(self._trackr_section.get("coalesce", False))
+
+    @property
+    def flights(self) -> SingleFlight:
+        """The searches of this module currently in flight."""
+
+        # created once under a lock, concurrent first searches must see the same instance
+        if self._flights is None:
+            with _flights_lock:
+                if self._flights is None:
+                    self._flights = SingleFlight()
+
+        return self._flights
+
+    @property
+    def multi_location(self) -> dict | None:
+        """The `trackr.multi_location` section of modules searching several locations in one request."""
+
+        return self._trackr_section.get("multi_location", None) or None
+
+    def _base_transport(self) -> Transport:
+        # with a rate limit throttled responses are retried by the limiter, after pacing and backing off
+        retry_statuses = () if self._trackr_section.get("rate_limit", None) else RETRY_STATUSES
+
+        return get_transport(self._trackr_section.get("transport", None), retry_statuses)
+
+    @property
+    def transport(self) -> Transport:
+        if self._transport is None:
+            self.transport = self._base_transport()
+
+        return self._transport
+
+    @transport.setter
+    def transport(self, transport: Transport) -> None:
+        volatile = (self._trackr_section.get("cache", None) or {}).get("volatile", [])
+
+        wrapped = isinstance(transport, (CachingTransport, CoalescingTransport, RateLimitedTransport))
+
+        # the shared host limits only pace requests actually sent upstream
+        if self._trackr_section.get("rate_limit", None) and not wrapped:
+            transport = RateLimitedTransport(transport, self._trackr_section["rate_limit"])
+
+        # identical requests are coalesced below the cache, so only cache misses are shared
+        if self.coalesce and not wrapped:
+            transport = CoalescingTransport(transport, volatile)
+
+        if self.cache is not None and not isinstance(transport, CachingTransport):
+            transport = CachingTransport(transport, self.cache, volatile)
+
+        self._transport = transport
+
     @classmethod
     def from_yaml(cls, file_path: str, **kwargs) -> "SearchModule":
-        with codecs.open(file_path, "r", "utf-8") as file:
-            data = yaml.safe_load(file)
+        import yaml
+
+        with open(file_path, "r", encoding="utf-8") as file:
+            data = yaml.load(file, Loader=get_yaml_loader())
 
         return cls(data, file_path, **kwargs)
 
+    @classmethod
+    def from_compiled(cls, file_path: str) -> "SearchModule":
+        """Load a compiled module, falling back to legacy pickled modules."""
+
+        if not ModuleFile.is_compiled(file_path):
+            return cls.from_pickle(file_path)
+
+        obj = ModuleFile(file_path).load()
+
+        if not isinstance(obj, cls):
+            raise ValueError("invalid compiled module file")
+
+        obj._file_path = file_path
+
+        return obj
+
     @classmethod
     def from_pickle(cls, file_path: str) -> "SearchModule":
+        import pickle
+
         with open(file_path, "rb") as file:
             obj = pickle.load(file)
 
@@ -260,8 +517,167 @@ class SearchModule:
         return obj
 
     def search(self, query: str, location: Any) -> list[dict]:
-        self._logger.info(f"Searching for: {query} (location: {location})")
-        self.attributes.update({"$query": query, "$location": location})
-        self._execute_actions()
+        """Search for `query` at `location`.
+
+        With `trackr.coalesce` enabled, concurrent searches for the same query
+        and location share one execution. Every caller gets its own copies of
+        the result dicts, and the callers that joined another search pass
+        metrics marked as `coalesced` to the metrics hooks.
+        """
+
+        try:
+            key = (query, location)
+            hash(key)
+        except TypeError:
+            key = None
+
+        if not self.coalesce or key is None:
+            return self._search(query, location)
+
+        metrics = SearchMetrics(self.id, query, location)
+        metrics.coalesced = True
+        led = False
+
+        def lead() -> list[dict]:
+            nonlocal led
+            led = True
+
+            return self._search(query, location)
+
+        # the leader's metrics are passed to the hooks by `_search`, the other callers pass their own
+        try:
+            with metrics.span("search"):
+                results, _ = self.flights.do(key, lead)
+        except BaseException as e:
+            if not led:
+                metrics.finish(e)
+            raise
+
+        if not led:
+            self._logger.debug("Coalesced search: %s (location: %s)", query, location)
+            metrics.finish()
+
+        # the results are handed to several callers, which must not see each other's changes
+        return [dict(result) for result in results]
+
+    def _search(self, query: str, location: Any) -> list[dict]:
+        self._logger.info("Searching for: %s (location: %s)", query, location)
+        context = SearchContext(self, query, location)
+
+        with self._measure(context):
+            self._execute_actions(context)
+
+            return self._map_results(context)
+
+    def search_columnar(self, query: str, location: Any) -> ResultBatch:
+        """Like `search`, but results are returned as a compact `ResultBatch`.
+
+        Attribute fields (query, location, store) are stored once instead of
+        in every result, rows can be materialized as dicts or slotted records.
+        """
+
+        self._logger.info("Searching for: %s (location: %s)", query, location)
+        context = SearchContext(self, query, location)
+
+        with self._measure(context):
+            self._execute_actions(context)
+
+            return self._map_columns(context)
+
+    def _search_locations(self, query: str, locations: list) -> dict[Any, list[dict]]:
+        if len(locations) == 1:
+            return {locations[0]: self.search(query, locations[0])}
+
+        self._logger.info("Searching for: %s (locations: %s)", query, locations)
+        context = SearchContext(self, query, locations[0], locations)
+
+        with self._measure(context):
+            self._execute_actions(context)
+
+            # the actions ran once for all locations, only the mapping is repeated per location
+            items = list(self.result_mapper.attribute_path.get(context.attributes))
+            results = {}
+
+            for location in locations:
+                context.attributes["$location"] = location
+                results[location] = self._map_results(context, items)
+
+            return results
+
+    def search_many(self, query: str, locations: Iterable, concurrency: int = DEFAULT_CONCURRENCY) -> dict[Any, list[dict]]:
+        """Search for `query` at several locations.
+
+        Modules with a `trackr.multi_location` section search up to its
+        `max_locations` locations per execution: actions see all of them in
+        `$locations` and the first one in `$location`, results are then mapped
+        once per location. Other modules run one search per location. The
+        executions run concurrently.
+
+        Requests of a multi location execution only see all the locations if
+        they use `$locations` or set `per_location`, requests using `$location`
+        alone only search the first one. Modules with location dependent
+        lookups, like metro's article search, set `per_location` on them, so
+        a location may get results which `search` at that location alone
+        wouldn't return when the mapping doesn't filter them by location.
+
+        Args:
+            query (str): The search query.
+            locations (Iterable): The locations, duplicates are searched once.
+            concurrency (int): The maximum number of concurrent executions.
+
+        Returns:
+            dict[Any, list[dict]]: The results of every location, in the order given.
+        """
+
+        locations = list(dict.fromkeys(locations))
+
+        if not locations:
+            return {}
+
+        size = int(self.multi_location.get("max_locations", len(locations))) if self.multi_location else 1
+        groups = [locations[index:index + max(1, size)] for index in range(0, len(locations), max(1, size))]
+
+        if len(groups) == 1:
+            return self._search_locations(query, groups[0])
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        results = {}
+
+        with ThreadPoolExecutor(min(max(1, concurrency), len(groups)), thread_name_prefix="trackr-locations") as executor:
+            for group_results in executor.map(lambda group: self._search_locations(query, group), groups):
+                results.update(group_results)
+
+        return results
+
+    def search_iter(self, query: str, location: Any) -> Iterator[dict]:
+        """Like `search`, but results are mapped and yielded one at a time.
+
+        Intermediate results produced lazily by `chain_update` steps (generator
+        expressions, `__.flatten`, fused pipelines) are only consumed as results are requested.
+        """
+
+        self._logger.info("Searching for: %s (location: %s)", query, location)
+        context = SearchContext(self, query, location)
+
+        with self._measure(context):
+            self._execute_actions(context)
+
+            with context.metrics.span("map"):
+                for result in self.result_mapper.iter(context):
+                    context.metrics.count("items_mapped")
+                    yield result
+
+            mapped = context.metrics.counters["items_mapped"]
+            context.metrics.count("eval_calls", mapped * self.result_mapper.evals_per_item)
+
+    async def search_async(self, query: str, location: Any) -> list[dict]:
+        """Like `search`, but independent actions run concurrently on the event loop."""
+
+        self._logger.info("Searching for: %s (location: %s)", query, location)
+        context = SearchContext(self, query, location)
+
+        with self._measure(context):
+            await self._execute_actions_async(context)
 
-        return self._map_results()
+            return self._map_results(context)
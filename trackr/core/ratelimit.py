@@ -0,0 +1,261 @@
+import logging, threading, time
+from urllib.parse import urlsplit
+
+from .transport import Transport, TransportResponse, RETRY_STATUSES as TRANSPORT_RETRY_STATUSES
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 1.0
+MAX_RETRY_AFTER = 60.0
+
+# share of the configured rate regained per successful response
+RATE_RECOVERY = 0.05
+# the rate never drops below this share of the configured rate
+MIN_RATE_SHARE = 1 / 16
+
+# throttled responses are only retried here, transports below a limiter must not retry them as well
+RETRY_STATUSES = (429, *TRANSPORT_RETRY_STATUSES)
+
+
+def is_throttled(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+def parse_retry_after(headers: dict) -> float | None:
+    for key, value in (headers or {}).items():
+        if key.lower() == "retry-after":
+            try:
+                return min(max(float(value), 0.0), MAX_RETRY_AFTER)
+            except (TypeError, ValueError):
+                # HTTP dates are not worth parsing here, the default backoff applies
+                return None
+
+    return None
+
+
+class HostLimiter:
+    """Adaptive rate and concurrency limit of one upstream host.
+
+    Requests take a token from a bucket refilled at `rate` per second holding
+    at most `burst` tokens, and at most `concurrency` requests are in flight.
+    Both limits are optional. A throttled response (429 or 5xx) halves the
+    current rate and concurrency and pauses the host for its `Retry-After` or
+    `backoff` seconds; successful responses restore the limits gradually
+    (additive increase, multiplicative decrease). Throttled responses to
+    requests started before the last decrease don't decrease it again.
+    """
+
+    host: str = None
+    max_rate: float = None
+    burst: float = None
+    max_concurrency: int = None
+    backoff: float = None
+
+    rate: float = None
+    concurrency: float = None
+    requests: int = 0
+    throttled: int = 0
+
+    def __init__(
+        self,
+        host: str,
+        rate: float = None,
+        burst: float = None,
+        concurrency: int = None,
+        backoff: float = DEFAULT_BACKOFF,
+    ) -> None:
+        if rate is not None and rate <= 0:
+            raise ValueError("rate must be positive")
+
+        if concurrency is not None and concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self.host = host
+        self.max_rate = rate
+        self.burst = max(1.0, burst if burst is not None else (rate or 1.0))
+        self.max_concurrency = concurrency
+        self.backoff = backoff
+
+        self.rate = rate
+        self.concurrency = concurrency
+
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._decreased = 0.0
+        self._active = 0
+        self._condition = threading.Condition()
+
+    def __repr__(self) -> str:
+        rate = f"{self.rate:.2f}/s" if self.rate is not None else "-"
+        concurrency = f"{int(self.concurrency)}" if self.concurrency is not None else "-"
+
+        return f"{self.__class__.__name__}<{self.host}, rate={rate}, concurrency={concurrency}>"
+
+    def _refill(self, now: float) -> None:
+        if self.rate is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Wait until a request may be sent, returns when it was started."""
+
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self.concurrency is not None and self._active >= int(self.concurrency):
+                    wait = None  # until a request is released
+                elif self.rate is not None and self._tokens < 1:
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    self._tokens -= 1
+                    self._active += 1
+                    self.requests += 1
+
+                    return now
+
+                self._condition.wait(wait)
+
+    def release(self, started: float, status_code: int = None, retry_after: float = None) -> None:
+        """Finish a request started by `acquire` and adapt the limits to its response.
+        Without a status code, e.g. when the request failed, the limits are kept."""
+
+        with self._condition:
+            self._active -= 1
+
+            if status_code is None:
+                pass
+            elif is_throttled(status_code):
+                self.throttled += 1
+                now = time.monotonic()
+                self._blocked_until = max(self._blocked_until, now + (retry_after if retry_after is not None else self.backoff))
+
+                if started >= self._decreased:
+                    self._decreased = now
+
+                    if self.max_rate is not None:
+                        self.rate = max(self.max_rate * MIN_RATE_SHARE, self.rate / 2)
+                        self._tokens = min(self._tokens, 0.0)
+
+                    if self.max_concurrency is not None:
+                        self.concurrency = max(1.0, self.concurrency / 2)
+
+                    logger.warning("Throttled by %s (status %d), backing off: %s", self.host, status_code, self)
+            else:
+                if self.max_rate is not None:
+                    self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY)
+
+                if self.max_concurrency is not None:
+                    self.concurrency = min(float(self.max_concurrency), self.concurrency + 1 / self.concurrency)
+
+            self._condition.notify_all()
+
+    def as_dict(self) -> dict:
+        return {
+            "rate": self.rate,
+            "max_rate": self.max_rate,
+            "concurrency": self.concurrency,
+            "max_concurrency": self.max_concurrency,
+            "requests": self.requests,
+            "throttled": self.throttled,
+        }
+
+
+_limiters: dict[str, HostLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(host: str, config: dict = None) -> HostLimiter:
+    """Get the process-wide limiter of a host.
+
+    The limits are taken from the config of the first module requesting the
+    host, all modules and searches share them afterwards.
+
+    Args:
+        host (str): The host, including a non-default port.
+        config (dict): The `trackr.rate_limit` section of a module.
+
+    Returns:
+        HostLimiter: The shared limiter.
+    """
+
+    config = config or {}
+
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = HostLimiter(
+                host,
+                rate=float(config["rate"]) if config.get("rate", None) is not None else None,
+                burst=float(config["burst"]) if config.get("burst", None) is not None else None,
+                concurrency=int(config["concurrency"]) if config.get("concurrency", None) is not None else None,
+                backoff=float(config.get("backoff", DEFAULT_BACKOFF)),
+            )
+            logger.debug("Created rate limiter: %s", _limiters[host])
+
+        return _limiters[host]
+
+
+def get_limiters() -> dict[str, HostLimiter]:
+    with _limiters_lock:
+        return dict(_limiters)
+
+
+class RateLimitedTransport(Transport):
+    """Transport wrapper pacing requests with the shared `HostLimiter` of each host.
+
+    Responses with a status in `RETRY_STATUSES` are retried up to `retries`
+    times, after the host's backoff. The wrapped transport should not retry
+    these statuses itself (see `get_transport`), otherwise its retries
+    multiply with these and bypass the limiter.
+    """
+
+    transport: Transport = None
+    config: dict = None
+    retries: int = None
+
+    def __init__(self, transport: Transport, config: dict = None) -> None:
+        self.transport = transport
+        self.config = dict(config or {})
+        self.retries = int(self.config.get("retries", DEFAULT_RETRIES))
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.transport}, retries={self.retries}>"
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        timeout: float = None,
+    ) -> TransportResponse:
+        limiter = get_limiter(urlsplit(url).netloc, self.config)
+
+        for attempt in range(self.retries + 1):
+            started = limiter.acquire()
+
+            try:
+                response = self.transport.request(method, url, headers=headers, params=params, timeout=timeout)
+            except BaseException:
+                limiter.release(started)
+                raise
+
+            limiter.release(started, response.status_code, parse_retry_after(response.headers))
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                return response
+
+            logger.debug("Retrying throttled request: %s %s (attempt %d)", method, url, attempt + 1)
+
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
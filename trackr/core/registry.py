@@ -0,0 +1,249 @@
+import hashlib, logging, os, threading, time
+from pathlib import Path
+from typing import Iterator
+
+from trackr import MODULE_FILE_EXTENSION
+
+from .compiled import ModuleFile
+from .module import SearchModule
+
+
+class ModuleEntry:
+    name: str = None
+    file_path: str = None
+    module: SearchModule = None
+    error: BaseException = None
+
+    watched: list[str] = None
+    mtimes: dict[str, float] = None
+    content_hash: str = None
+    checked_at: float = 0.0
+
+    def __init__(self, name: str, file_path: str) -> None:
+        self.name = name
+        self.file_path = file_path
+        self.watched = [file_path]
+        self.mtimes = {}
+
+        self.lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.name}: {self.file_path}, loaded={self.module is not None}>"
+
+
+class ModuleRegistry:
+    """Shared, lazily loaded search modules of a directory.
+
+    Modules are discovered by file name, `atb.yaml` and `atb.yaml.ysm` both
+    provide the module `atb` and the compiled file wins unless it is older
+    than its sources, then the YAML is loaded instead. A module is loaded
+    on first use and kept in memory. At most every `check_interval` seconds
+    `get` checks the modification time of the module's files, including the
+    sources of a compiled module, and if their content changed, loads the
+    new version and swaps it in. Searches
+    that already hold the old module finish on it, and other callers keep
+    getting the old module while the new one is loading.
+    """
+
+    directory: Path = None
+    check_interval: float = None
+
+    _entries: dict[str, ModuleEntry] = None
+    _logger: logging.Logger = None
+
+    def __init__(self, directory: str, check_interval: float = 1.0) -> None:
+        self._logger = logging.getLogger(f"{__name__}.{self.__class__.__name__}")
+
+        self.directory = Path(directory)
+        self.check_interval = check_interval
+
+        self._entries = {}
+        self._lock = threading.Lock()
+
+        self.discover()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.directory}: {self.names}>"
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def names(self) -> list[str]:
+        return sorted(self._entries.keys())
+
+    # Discovery
+
+    def discover(self) -> list[str]:
+        """Scan the directory for modules, new files are added and removed files dropped."""
+
+        found: dict[str, str] = {}
+
+        for file_path in sorted(self.directory.glob("*.yaml")):
+            found[file_path.name.split(".")[0]] = str(file_path)
+
+        for file_path in sorted(self.directory.glob(f"*{MODULE_FILE_EXTENSION}")):
+            found[file_path.name.split(".")[0]] = str(file_path)
+
+        with self._lock:
+            for name in set(self._entries) - set(found):
+                self._logger.info(f"Module removed: {name}")
+                del self._entries[name]
+
+            for name, file_path in found.items():
+                entry = self._entries.get(name, None)
+
+                if entry is None or entry.file_path != file_path:
+                    self._entries[name] = ModuleEntry(name, file_path)
+
+        self._logger.debug(f" discovered modules: {self.names}")
+
+        return self.names
+
+    # Loading
+
+    def _hash(self, watched: list[str]) -> str:
+        digest = hashlib.sha256()
+
+        for file_path in watched:
+            with open(file_path, "rb") as file:
+                digest.update(file.read())
+
+        return digest.hexdigest()
+
+    def _mtimes(self, watched: list[str]) -> dict[str, float]:
+        return {file_path: os.stat(file_path).st_mtime_ns for file_path in watched}
+
+    def _load_compiled(self, file_path: str) -> tuple[SearchModule, list[str]]:
+        # legacy pickled modules don't record their sources
+        if not ModuleFile.is_compiled(file_path):
+            return SearchModule.from_compiled(file_path), [file_path]
+
+        module_file = ModuleFile(file_path)
+        sources = module_file.source_paths
+
+        # compiled modules may be deployed without their sources, then they can't be stale
+        if not sources or not all(os.path.exists(source) for source in sources):
+            return SearchModule.from_compiled(file_path), [file_path, *filter(os.path.exists, sources)]
+
+        if module_file.is_up_to_date():
+            return SearchModule.from_compiled(file_path), [file_path, *sources]
+
+        # the compiled file is still watched, recompiling it switches back to it
+        self._logger.warning(f"Compiled module is out of date, loading its source: {file_path}")
+        module = SearchModule.from_yaml(sources[0])
+
+        return module, [file_path, *module.source_files]
+
+    def _load(self, entry: ModuleEntry) -> None:
+        if entry.file_path.endswith(MODULE_FILE_EXTENSION):
+            module, watched = self._load_compiled(entry.file_path)
+        else:
+            module = SearchModule.from_yaml(entry.file_path)
+            watched = module.source_files
+
+        entry.watched = watched
+        entry.mtimes = self._mtimes(watched)
+        entry.content_hash = self._hash(watched)
+        entry.checked_at = time.monotonic()
+
+        # a single reference assignment, readers see either the old or the new module
+        entry.module = module
+
+        self._logger.info(f"Loaded module: {entry.name} ({entry.file_path})")
+
+    def _load_first(self, entry: ModuleEntry) -> None:
+        # a module that failed to load is only retried once its files change
+        if entry.error is not None and not self._is_stale(entry):
+            raise entry.error
+
+        try:
+            self._load(entry)
+        except (Exception, SystemExit) as e:
+            entry.error = e
+            entry.mtimes = self._mtimes(entry.watched)
+            entry.content_hash = self._hash(entry.watched)
+            raise
+        else:
+            entry.error = None
+
+    def _is_stale(self, entry: ModuleEntry) -> bool:
+        entry.checked_at = time.monotonic()
+
+        try:
+            mtimes = self._mtimes(entry.watched)
+        except OSError:
+            return False
+
+        if mtimes == entry.mtimes:
+            return False
+
+        entry.mtimes = mtimes
+
+        # touched files with the same content are not reloaded
+        return self._hash(entry.watched) != entry.content_hash
+
+    def get(self, name: str) -> SearchModule:
+        if name not in self._entries:
+            self.discover()
+
+        if (entry := self._entries.get(name, None)) is None:
+            raise KeyError(f"unknown module: {name}")
+
+        if entry.module is None:
+            with entry.lock:
+                if entry.module is None:
+                    self._load_first(entry)
+
+            return entry.module
+
+        if time.monotonic() - entry.checked_at < self.check_interval:
+            return entry.module
+
+        # only one caller checks and reloads, the others keep using the current module
+        if entry.lock.acquire(blocking=False):
+            try:
+                if self._is_stale(entry):
+                    self._logger.info(f"Module changed, reloading: {name}")
+                    self.reload(name)
+            finally:
+                entry.lock.release()
+
+        return entry.module
+
+    def reload(self, name: str) -> SearchModule:
+        entry = self._entries[name]
+
+        try:
+            self._load(entry)
+        except (Exception, SystemExit) as e:
+            # invalid modules call error_exit, which must not stop a running service
+            self._logger.error(f"Failed to reload module {name}, keeping the loaded version")
+            self._logger.exception(e)
+
+        return entry.module
+
+    def loaded(self) -> dict[str, SearchModule]:
+        """The modules loaded so far, without loading or checking any."""
+
+        return {name: entry.module for name, entry in sorted(self._entries.items()) if entry.module is not None}
+
+    def load_all(self) -> dict[str, SearchModule]:
+        """Load (or refresh) every module, modules failing to load are skipped."""
+
+        modules = {}
+
+        for name in self.names:
+            try:
+                modules[name] = self.get(name)
+            except (Exception, SystemExit) as e:
+                self._logger.error(f"Failed to load module: {name}")
+                self._logger.exception(e)
+
+        return modules
@@ -0,0 +1,222 @@
+import functools, json, keyword, math
+from itertools import repeat, starmap
+from json.encoder import encode_basestring
+from typing import Any, Iterator, TextIO
+
+
+_encode = json.JSONEncoder(ensure_ascii=False, default=str).encode
+
+
+class Record:
+    """Base of the slotted result records created by `record_type`."""
+
+    __slots__ = ()
+    fields: tuple[str, ...] = ()
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.fields)
+        return f"{self.__class__.__name__}({values})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Record) or other.fields != self.fields:
+            return NotImplemented
+
+        return all(getattr(self, name) == getattr(other, name) for name in self.fields)
+
+    def __reduce__(self):
+        # record types are created at runtime, so they are pickled by their fields
+        return _make_record, (self.fields, tuple(getattr(self, name) for name in self.fields))
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.fields}
+
+
+@functools.lru_cache(maxsize=None)
+def record_type(fields: tuple[str, ...]) -> type[Record]:
+    """Slotted record class with the given fields, one class per distinct field tuple.
+
+    Example:
+        >>> Result = record_type(("name", "price"))
+        >>> Result("milk", 42).price
+        42
+    """
+
+    for name in fields:
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError(f"invalid record field: {name!r}")
+
+    source = (
+        f"def __init__(self, {', '.join(fields)}):\n"
+        + "".join(f"    self.{name} = {name}\n" for name in fields)
+        if fields else "def __init__(self):\n    pass\n"
+    )
+    namespace = {}
+    exec(compile(source, "<result record>", "exec"), namespace)
+
+    return type("Result", (Record,), {"__slots__": fields, "fields": fields, "__init__": namespace["__init__"]})
+
+
+def _make_record(fields: tuple[str, ...], values: tuple) -> Record:
+    return record_type(fields)(*values)
+
+
+def _encode_column(values: list) -> list[str]:
+    # columns of a single basic type are encoded by C functions in one pass, others value by value
+    types = set(map(type, values))
+
+    if types <= {str}:
+        return list(map(encode_basestring, values))
+
+    if types <= {int}:
+        return list(map(int.__repr__, values))
+
+    if types <= {float} and all(map(math.isfinite, values)):
+        return list(map(float.__repr__, values))
+
+    return list(map(_encode, values))
+
+
+class ResultBatch:
+    """Results of a search stored by column.
+
+    Fields with the same value for every result, such as the query, location
+    and store, are stored once in `constants`, every other field is a list in
+    `columns`. The batch is serialized as is (`to_json`) or row by row
+    (`iter_jsonl`), rows are materialized as dicts or slotted records.
+    """
+
+    __slots__ = ("fields", "columns", "constants", "length")
+
+    fields: tuple[str, ...]
+    columns: dict[str, list]
+    constants: dict[str, Any]
+    length: int
+
+    def __init__(
+        self, fields: tuple[str, ...], columns: dict[str, list], constants: dict[str, Any] = None, length: int = None
+    ) -> None:
+        self.fields = tuple(fields)
+        self.columns = columns
+        self.constants = constants or {}
+
+        lengths = {len(column) for column in columns.values()}
+
+        if len(lengths) > 1:
+            raise ValueError("columns must have the same length")
+
+        if set(self.fields) != set(columns) | set(self.constants):
+            raise ValueError("fields must be either columns or constants")
+
+        # without columns the length can't be derived, e.g. when every field is an attribute
+        self.length = lengths.pop() if lengths else (length or 0)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.length} results, constants={list(self.constants)}>"
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.dicts())
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ResultBatch):
+            return NotImplemented
+
+        return self.dicts() == other.dicts()
+
+    def column(self, name: str) -> list:
+        if name in self.columns:
+            return self.columns[name]
+
+        return [self.constants[name]] * self.length
+
+    def _rows(self) -> Iterator[tuple]:
+        if not self.length:
+            return iter(())
+
+        return zip(*[
+            self.columns[name] if name in self.columns else repeat(self.constants[name], self.length)
+            for name in self.fields
+        ])
+
+    def dicts(self) -> list[dict]:
+        """The results as the dicts returned by `SearchModule.search`."""
+
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in self._rows()]
+
+    def records(self) -> list[Record]:
+        """The results as slotted records."""
+
+        return list(starmap(record_type(self.fields), self._rows()))
+
+    def as_dict(self) -> dict:
+        return {"fields": list(self.fields), "length": self.length, "constants": self.constants, "columns": self.columns}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ResultBatch":
+        return cls(data["fields"], data["columns"], data.get("constants", None), data.get("length", None))
+
+    @classmethod
+    def from_dicts(cls, results: list[dict], fields: tuple[str, ...] = None) -> "ResultBatch":
+        """Build a batch from result dicts, fields with a single value become constants."""
+
+        if fields is None:
+            fields = tuple(results[0]) if results else ()
+
+        columns, constants = {}, {}
+
+        for name in fields:
+            values = [result.get(name, None) for result in results]
+
+            if values and all(type(value) is type(values[0]) and value == values[0] for value in values):
+                constants[name] = values[0]
+            else:
+                columns[name] = values
+
+        return cls(fields, columns, constants, len(results))
+
+    def to_json(self) -> str:
+        """The columnar form as JSON, see `as_dict`."""
+
+        return _encode(self.as_dict())
+
+    def iter_jsonl(self) -> Iterator[str]:
+        """Yield every result as a JSON object line (without the newline).
+
+        The lines equal `json.dumps(result, ensure_ascii=False)` of the result
+        dicts. Constants are encoded once and columns are encoded as a whole.
+        """
+
+        if not self.length:
+            return
+
+        parts = []
+
+        for name in self.fields:
+            key = _encode(name).replace("{", "{{").replace("}", "}}")
+
+            if name in self.columns:
+                parts.append(f"{key}: {{}}")
+            else:
+                parts.append(f"{key}: " + _encode(self.constants[name]).replace("{", "{{").replace("}", "}}"))
+
+        template = "{{" + ", ".join(parts) + "}}"
+
+        if not self.columns:
+            yield from repeat(template.format(), self.length)
+            return
+
+        yield from map(template.format, *[_encode_column(self.columns[name]) for name in self.fields if name in self.columns])
+
+    def write_jsonl(self, file: TextIO) -> int:
+        """Write every result as a line to a text file, returns the number of lines."""
+
+        count = 0
+
+        for line in self.iter_jsonl():
+            file.write(line + "\n")
+            count += 1
+
+        return count
@@ -0,0 +1,70 @@
+
+from .actions import Action
+
+
+class ActionGraph:
+    """Dependency graph of a module's actions.
+
+    An action depends on every earlier action that writes an attribute it reads
+    or writes, and on every earlier action reading an attribute it overwrites.
+    Actions without a path between them are independent and can run concurrently.
+    """
+
+    actions: list[Action] = None
+    dependencies: list[set[int]] = None
+
+    def __init__(self, actions: list[Action]) -> None:
+        self.actions = list(actions)
+        self.dependencies = []
+
+        for index, action in enumerate(self.actions):
+            inputs, outputs = action.inputs, action.outputs
+
+            self.dependencies.append({
+                previous_index
+                for previous_index, previous in enumerate(self.actions[:index])
+                if previous.outputs & (inputs | outputs) or previous.inputs & outputs
+            })
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.levels()}>"
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def levels(self) -> list[list[int]]:
+        """Group action indexes by their depth in the graph, the number of levels
+        is the length of the critical path."""
+
+        depths = []
+
+        for dependencies in self.dependencies:
+            depths.append(max((depths[d] + 1 for d in dependencies), default=0))
+
+        return [
+            [index for index, depth in enumerate(depths) if depth == level]
+            for level in range(max(depths, default=-1) + 1)
+        ]
+
+    async def run(self, parent: object) -> None:
+        import asyncio
+
+        tasks: list[asyncio.Task] = []
+
+        async def run_action(index: int, action: Action, dependencies: list[asyncio.Task]) -> None:
+            if dependencies:
+                await asyncio.gather(*dependencies)
+
+            with parent.metrics.span(action.action, index=index):
+                await action.run_async(parent)
+
+        for index, (action, dependencies) in enumerate(zip(self.actions, self.dependencies)):
+            tasks.append(
+                asyncio.create_task(run_action(index, action, [tasks[d] for d in dependencies]))
+            )
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
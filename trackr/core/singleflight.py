@@ -0,0 +1,117 @@
+import logging, threading
+from typing import Any, Callable, Hashable
+
+from .cache import make_cache_key
+from .transport import Transport, TransportResponse
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution.
+
+    The first caller of a key runs the function, callers arriving while it
+    is still running wait for it and get the same result or exception. Once
+    the call returned the key is forgotten, so nothing is cached.
+    """
+
+    calls: int = 0
+    coalesced: int = 0
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{len(self._flights)} in flight, {self.coalesced}/{self.calls} coalesced>"
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> tuple[Any, bool]:
+        """Run `func` unless a call with the same key is in flight.
+
+        Returns:
+            tuple[Any, bool]: The result and whether it was shared with another caller.
+        """
+
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key, None)
+
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.result, True
+
+        try:
+            flight.result = func(*args, **kwargs)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+            flight.done.set()
+
+        return flight.result, False
+
+
+class CoalescingTransport(Transport):
+    """Transport wrapper sending identical concurrent requests upstream only once.
+
+    Requests are identical when method, URL and params match, volatile params
+    such as cache busting timestamps are ignored like in `CachingTransport`.
+    """
+
+    transport: Transport = None
+    volatile: set[str] = None
+    flights: SingleFlight = None
+
+    def __init__(self, transport: Transport, volatile: list[str] = None) -> None:
+        self.transport = transport
+        self.volatile = set(volatile or [])
+        self.flights = SingleFlight()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.transport}, {self.flights}>"
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        timeout: float = None,
+    ) -> TransportResponse:
+        key = make_cache_key(method, url, params, self.volatile)
+
+        response, shared = self.flights.do(
+            key, self.transport.request, method, url, headers=headers, params=params, timeout=timeout
+        )
+
+        if shared:
+            logger.debug("Coalesced request: %s %s", method, url)
+
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
@@ -0,0 +1,287 @@
+import json, logging, threading
+from abc import abstractmethod, ABC
+from typing import Any
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.3
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class TransportResponse:
+    status_code: int = None
+    content: bytes = None
+    headers: dict = None
+
+    def __init__(self, status_code: int, content: bytes, headers: dict = None) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.status_code}, {len(self.content)} bytes>"
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class Transport(ABC):
+    @abstractmethod
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        timeout: float = None,
+    ) -> TransportResponse:
+        pass
+
+    async def request_async(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        timeout: float = None,
+    ) -> TransportResponse:
+        import asyncio
+
+        # blocking transports are run in the default executor, so requests issued
+        # by independent actions are still in flight at the same time
+        return await asyncio.to_thread(
+            self.request, method, url, headers=headers, params=params, timeout=timeout
+        )
+
+    def close(self) -> None:
+        pass
+
+
+class HTTPTransport(Transport):
+    """HTTP transport backed by a `requests.Session`.
+
+    Connections are kept alive and pooled per host, failed requests and
+    responses with a status in `retry_statuses` are retried with an
+    exponential backoff.
+    """
+
+    pool_size: int = None
+    timeout: float = None
+    retries: int = None
+    backoff: float = None
+    retry_statuses: tuple[int, ...] = None
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        retry_statuses: tuple[int, ...] = RETRY_STATUSES,
+    ) -> None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_statuses = tuple(retry_statuses)
+
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=self.retry_statuses,
+                allowed_methods=frozenset({"GET", "POST"}),
+                raise_on_status=False,
+            ),
+        )
+
+        self._session = requests.Session()
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<pool_size={self.pool_size}, timeout={self.timeout}, retries={self.retries}>"
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        timeout: float = None,
+    ) -> TransportResponse:
+        response = self._session.request(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            timeout=self.timeout if timeout is None else timeout,
+        )
+
+        return TransportResponse(response.status_code, response.content, dict(response.headers))
+
+    def close(self) -> None:
+        self._session.close()
+
+
+class StaticTransport(Transport):
+    """In-process stand-in for `HTTPTransport`, used to run modules without network.
+
+    Routes map an URL (or a `(method, url)` tuple) to a response. A response is
+    either a `TransportResponse`, a callable receiving the request arguments, or
+    any JSON-serializable value which is returned with status 200. Unknown routes
+    return 404. Every handled request is recorded in `calls`.
+    """
+
+    routes: dict = None
+    calls: list[dict] = None
+
+    def __init__(self, routes: dict = None) -> None:
+        self.routes = dict(routes or {})
+        self.calls = []
+
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{len(self.routes)} routes>"
+
+    def add_route(self, url: str, response: Any, method: str = None) -> None:
+        self.routes[(method, url) if method else url] = response
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        timeout: float = None,
+    ) -> TransportResponse:
+        call = {"method": method, "url": url, "headers": headers, "params": params}
+
+        with self._lock:
+            self.calls.append(call)
+
+        response = self.routes.get((method, url), self.routes.get(url, None))
+
+        if response is None:
+            return TransportResponse(404, b"null")
+
+        if callable(response):
+            response = response(**call)
+
+        if isinstance(response, TransportResponse):
+            return response
+
+        return TransportResponse(200, json.dumps(response).encode("utf-8"))
+
+    @classmethod
+    def from_recording(cls, file_path: str) -> "StaticTransport":
+        """Replay responses saved by `RecordingTransport`. Requests are matched by
+        method and URL only, so any query gets the recorded response."""
+
+        with open(file_path, "r", encoding="utf-8") as file:
+            exchanges = json.load(file)
+
+        routes = {}
+
+        for exchange in exchanges:
+            routes[(exchange["method"], exchange["url"])] = TransportResponse(
+                exchange["status_code"], exchange["content"].encode("utf-8"), exchange.get("headers", None)
+            )
+
+        return cls(routes)
+
+
+class RecordingTransport(Transport):
+    """Transport wrapper recording every exchange, see `StaticTransport.from_recording`."""
+
+    transport: Transport = None
+    exchanges: list[dict] = None
+
+    def __init__(self, transport: Transport) -> None:
+        self.transport = transport
+        self.exchanges = []
+
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.transport}, {len(self.exchanges)} exchanges>"
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        headers: dict = None,
+        params: dict = None,
+        timeout: float = None,
+    ) -> TransportResponse:
+        response = self.transport.request(method, url, headers=headers, params=params, timeout=timeout)
+
+        with self._lock:
+            self.exchanges.append({
+                "method": method,
+                "url": url,
+                "params": params,
+                "status_code": response.status_code,
+                "headers": response.headers,
+                "content": response.content.decode("utf-8", errors="replace"),
+            })
+
+        return response
+
+    def save(self, file_path: str) -> None:
+        with self._lock:
+            exchanges = list(self.exchanges)
+
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(exchanges, file, ensure_ascii=False, indent=2, default=str)
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+_transports: dict[tuple, Transport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(config: dict = None, retry_statuses: tuple[int, ...] = RETRY_STATUSES) -> Transport:
+    """Get a shared `HTTPTransport` for a transport config section.
+
+    Modules with the same config share one transport and therefore one
+    connection pool per host.
+
+    Args:
+        config (dict): The `trackr.transport` section of a module.
+        retry_statuses (tuple[int, ...]): Response statuses retried by the transport.
+
+    Returns:
+        Transport: The shared transport.
+    """
+
+    config = config or {}
+    options = {
+        "pool_size": int(config.get("pool_size", DEFAULT_POOL_SIZE)),
+        "timeout": float(config.get("timeout", DEFAULT_TIMEOUT)),
+        "retries": int(config.get("retries", DEFAULT_RETRIES)),
+        "backoff": float(config.get("backoff", DEFAULT_BACKOFF)),
+        "retry_statuses": tuple(retry_statuses),
+    }
+    key = tuple(sorted(options.items()))
+
+    with _transports_lock:
+        if key not in _transports:
+            _transports[key] = HTTPTransport(**options)
+            logger.debug("Created transport: %s", _transports[key])
+
+        return _transports[key]
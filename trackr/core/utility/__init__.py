@@ -1 +1,2 @@
-from .utility import *  # noqa
\ No newline at end of file
+from .utility import *  # noqa
+from .path import *  # noqa
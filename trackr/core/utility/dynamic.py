@@ -1,4 +1,21 @@
+from itertools import chain
 
 
 def array_flatten(arr):
     return [item for sublist in arr for item in sublist]
+
+
+# Lazy pipeline operators, chain_update pipelines are fused into a single
+# expression of these and the lazy builtins `map` and `filter`, so nothing is
+# materialized before the results are mapped
+
+
+def flatten(iterable):
+    """Lazily flatten one level of nesting.
+
+    Example:
+        >>> list(__.flatten([[1, 2], [3]]))
+        [1, 2, 3]
+    """
+
+    return chain.from_iterable(iterable)
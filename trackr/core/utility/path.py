@@ -0,0 +1,128 @@
+from functools import lru_cache
+from typing import Any, Iterator
+
+
+WILDCARD = "*"
+
+_MISSING = object()
+
+
+class DotPath:
+    """Precompiled dot path accessor. Example:
+    >>> path = DotPath("results.item_groups.*.items.0.name")  # Compile the path once
+    >>> path.get({"results": {"item_groups": [{"items": [{"name": "a"}]}, {"items": []}]}})
+    ['a']
+
+    Segments are dictionary keys, list indices (negative indices count from the
+    end) or `*`, which selects every item of a list or every value of a
+    dictionary. Paths containing a wildcard return a flat list of all matches,
+    missing branches are skipped.
+
+    Args:
+        path (str): The dot path.
+    """
+
+    path: str = None
+    keys: tuple = None
+    has_wildcard: bool = False
+
+    def __init__(self, path: str) -> None:
+        self.path = str(path)
+        self.keys = tuple(self._parse(key) for key in self.path.split("."))
+        self.has_wildcard = any(key is WILDCARD for key, _ in self.keys)
+
+        if len(self.keys) == 1 and self.keys[0][1] is None and not self.has_wildcard:
+            self.get = self._get_key
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}<{self.path}>"
+
+    def __reduce__(self):
+        return self.__class__, (self.path,)
+
+    def __call__(self, d: Any, default=None) -> Any:
+        return self.get(d, default)
+
+    @staticmethod
+    def _parse(key: str) -> tuple[str, int | None]:
+        if key == WILDCARD:
+            return WILDCARD, None
+
+        try:
+            return key, int(key)
+        except ValueError:
+            return key, None
+
+    @staticmethod
+    def _step(d: Any, key: str, index: int | None) -> Any:
+        if isinstance(d, dict):
+            return d.get(key, _MISSING)
+
+        if index is not None and isinstance(d, (list, tuple)) and -len(d) <= index < len(d):
+            return d[index]
+
+        return _MISSING
+
+    def _get_key(self, d: Any, default=None) -> Any:
+        if isinstance(d, dict):
+            return d.get(self.path, default)
+
+        return default
+
+    def _iter(self, d: Any, position: int) -> Iterator[Any]:
+        for offset, (key, index) in enumerate(self.keys[position:], position):
+            if key is WILDCARD:
+                children = d.values() if isinstance(d, dict) else d if isinstance(d, (list, tuple)) else ()
+
+                for child in children:
+                    yield from self._iter(child, offset + 1)
+
+                return
+
+            if (d := self._step(d, key, index)) is _MISSING:
+                return
+
+        yield d
+
+    def iter(self, d: Any) -> Iterator[Any]:
+        """Lazily yield every value matched by the path."""
+
+        return self._iter(d, 0)
+
+    def get(self, d: Any, default=None) -> Any:
+        if self.has_wildcard:
+            return list(self._iter(d, 0))
+
+        for key, index in self.keys:
+            if (d := self._step(d, key, index)) is _MISSING:
+                return default
+
+        return d
+
+    def set(self, d: dict, value: Any) -> None:
+        """Set a value in place, missing dictionaries along the path are created."""
+
+        if self.has_wildcard:
+            raise ValueError(f"can't set a wildcard path: {self.path}")
+
+        for key, index in self.keys[:-1]:
+            if isinstance(d, dict):
+                d = d.setdefault(key, {})
+            elif (child := self._step(d, key, index)) is not _MISSING:
+                d = child
+            else:
+                raise ValueError(f"invalid path: {self.path}")
+
+        key, index = self.keys[-1]
+
+        if isinstance(d, list) and index is not None:
+            d[index] = value
+        else:
+            d[key] = value
+
+
+@lru_cache(maxsize=1024)
+def compile_path(path: str) -> DotPath:
+    """Get a shared `DotPath` for a dot path, paths are only parsed once."""
+
+    return DotPath(path)
@@ -1,6 +1,8 @@
 import logging
 from typing import Any
 
+from .path import compile_path
+
 
 def has_keys(d: dict, keys: list) -> bool:
     return all(key in d for key in keys)
@@ -27,15 +29,37 @@ def set_by_dot_path(d: dict, path: str, value: Any) -> None:
         value (Any): The value.
     """
 
-    keys = path.split(".")
+    compile_path(path).set(d, value)
 
-    for key in keys[:-1]:
-        if key not in d:
-            d[key] = {}
 
-        d = d[key]
+def replace_by_dot_path(d: dict, path: str, value: Any) -> dict:
+    """Return a copy of a dictionary with a value set by a dot path. Only the
+    dictionaries along the path are copied, the original is never modified. Example:
+    >>> d = {"a": {"b": 1}, "c": 2}  # Create a dictionary
+    >>> replace_by_dot_path(d, "a.b", 3)  # Replace the value at a.b
+    {'a': {'b': 3}, 'c': 2}
+    >>> d
+    {'a': {'b': 1}, 'c': 2}
 
-    d[keys[-1]] = value
+    Args:
+        d (dict): The dictionary.
+        path (str): The dot path.
+        value (Any): The value.
+
+    Returns:
+        dict: The updated copy.
+    """
+
+    key, _, rest = path.partition(".")
+    result = dict(d)
+
+    if rest:
+        child = d.get(key)
+        result[key] = replace_by_dot_path(child if isinstance(child, dict) else {}, rest, value)
+    else:
+        result[key] = value
+
+    return result
 
 
 def get_by_dot_path(d: dict, path: str, default=None) -> Any:
@@ -52,12 +76,4 @@ def get_by_dot_path(d: dict, path: str, default=None) -> Any:
         Any: The value.
     """
 
-    keys = path.split(".")
-
-    for key in keys:
-        if key not in d:
-            return default
-
-        d = d[key]
-
-    return d
+    return compile_path(path).get(d, default)